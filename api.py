@@ -0,0 +1,147 @@
+# Versioned JSON API used by the pages that render in the browser (/api/v1/...)
+import gzip
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy.orm import load_only
+
+from caches import owned_games, catalogue_fragments
+from catalogue_index import catalogue_index, catalogue_query, parse_catalogue_filters
+from facets import facet_index
+from images import image_sources
+from models import Game
+from pagination import keyset_page
+
+# Optional: faster JSON encoding and brotli compression (json/gzip are used without them)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# Fields a game can be asked for with ?fields=, and the ones sent by default (what a catalogue card shows)
+GAME_COLUMNS = ("id", "title", "description", "developer", "publisher", "price", "price_cents",
+                "genre", "size", "size_mb", "video_link")
+GAME_FIELDS = GAME_COLUMNS + ("cover",)
+DEFAULT_GAME_FIELDS = ("id", "title", "genre", "price", "cover")
+MAX_PAGE_SIZE = 100
+
+
+def dumps(payload):
+    """Serialize 'payload' to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+
+def accepted_encoding():
+    """The best compression the client accepts that we can produce, or None."""
+    if brotli is not None and request.accept_encodings["br"]:
+        return "br"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+def json_response(key, build):
+    """
+    Compressed JSON response for build()'s payload, cached under 'key' per encoding.
+    - Browsers revalidate with the ETag and get 304 Not Modified when nothing changed.
+    """
+    encoding = accepted_encoding()
+    body, etag = catalogue_fragments.get_or_render(
+        (key, encoding), lambda: compress(dumps(build()), encoding)
+    )
+    response = Response(body, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+def error(message, status=400):
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+def parse_fields(value, allowed, default):
+    """Validate a comma-separated ?fields= list; returns a tuple, or None if a name isn't in 'allowed'."""
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    if not fields or any(name not in allowed for name in fields):
+        return None
+    return fields
+
+def game_json(game, fields):
+    data = {}
+    for name in fields:
+        if name == "cover":
+            data[name] = image_sources(f"images/covers/{game.id}-cover.jpg")
+        else:
+            data[name] = getattr(game, name)
+    return data
+
+@bp.route("/games")
+@login_required
+def games():
+    """
+    One page of the catalogue (games the user doesn't own) as JSON.
+    - Takes the /catalogue filter arguments, plus 'cursor', 'limit' and 'fields'
+      (comma-separated names from GAME_FIELDS; default DEFAULT_GAME_FIELDS).
+    - Returns {"games": [...], "next_cursor": ...}; next_cursor is null on the last page.
+    - With 'facets=1' it also returns "facets": games per genre and price/size histograms (see facets.py).
+    """
+    fields = parse_fields(request.args.get("fields"), GAME_FIELDS, DEFAULT_GAME_FIELDS)
+    if fields is None:
+        return error(f"fields must be a comma-separated list of: {', '.join(GAME_FIELDS)}")
+    limit = request.args.get("limit", current_app.config["PAGE_SIZE"], type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return error(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    index = catalogue_index.ensure_loaded()
+    filters = parse_catalogue_filters(request.args, index)
+    cursor = request.args.get("cursor")
+    owned = owned_games.get(current_user.id)
+    with_facets = request.args.get("facets", 0, type=int) == 1
+
+    def build():
+        result = catalogue_query(**filters._asdict(), exclude_owned=owned)
+        # Only read the columns that were asked for (the id is always needed, for the cover and the cursor)
+        columns = [getattr(Game, name) for name in GAME_COLUMNS if name in fields or name == "id"]
+        items, next_cursor = keyset_page(
+            result.query.options(load_only(*columns)),
+            result.sort_columns,
+            result.sort,
+            cursor=cursor,
+            per_page=limit,
+        )
+        payload = {"games": [game_json(game, fields) for game in items], "next_cursor": next_cursor}
+        if with_facets:
+            payload["facets"] = facet_index.counts(index, filters, owned)
+        return payload
+
+    # Same idea as the /catalogue fragment key: filters plus data versions
+    key = (
+        "api/games",
+        fields,
+        filters._replace(title=filters.title.lower()),
+        cursor,
+        limit,
+        with_facets,
+        index.version,
+        owned.version,
+    )
+    return json_response(key, build)
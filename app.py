@@ -1,5 +1,12 @@
 # Import Flask and related modules
-from flask import Flask, render_template, redirect, url_for, flash, request, session
+import hashlib
+import hmac
+import os
+import time
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.http import is_resource_modified
+from markupsafe import Markup
+from flask import Blueprint, Flask, current_app, render_template, redirect, url_for, flash, request, session, make_response, abort, jsonify
 from flask_login import (
     LoginManager,
     login_user,
@@ -9,40 +16,114 @@ from flask_login import (
 )
 
 # Import your database model and forms
-from models import db, User, Game
-from forms import RegisterForm, LoginForm, EditAccountForm
+from models import (
+    db, User, Game, cart_item, purchase_games, add_cart_items, remove_cart_items, cart_game_ids,
+    purchase_counts, promote_users, delete_users,
+)
+# forms.py (WTForms) is imported by the views that use it, so a new worker starts without it
 from config import Config
-
-# Create the Flask app instance
-app = Flask(__name__)
-app.config.from_object(Config)  # Load settings like SECRET_KEY and DB path
-
-# Initialize the database with the app
-db.init_app(app)
-
-# Set up Flask-Login
-login_manager = LoginManager(app)
-login_manager.login_view = "login"  # Redirect to this route if login is required
+from catalogue_index import catalogue_index, catalogue_query, owned_ids_select, parse_catalogue_filters
+from facets import facet_index
+from caches import (
+    owned_games, carts, catalogue_fragments, game_cards, game_pages, user_snapshots, cache_stats, cache_sync,
+    evict_game,
+)
+import metrics
+from pagination import keyset_page, next_page_url
+import database
+from passwords import password_hasher, HasherBusy
+import api
+import migrations
+import catalogue_io
+import recommendations
+import images
+import assets
+import warmup
+
+# All the pages live on this blueprint; create_app() registers it on the app
+bp = Blueprint("main", __name__)
+
+# Set up Flask-Login (attached to the app in create_app())
+login_manager = LoginManager()
+login_manager.login_view = "main.login"  # Redirect to this route if login is required
+login_manager.blueprint_login_views["api"] = None  # ... except the JSON API, which answers 401
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load a user by ID for session tracking (used by Flask-Login)."""
-    return db.session.get(User, int(user_id))
+    """Load a user by ID for session tracking (used by Flask-Login), as a cached read-only snapshot."""
+    return user_snapshots.get(int(user_id))
 
-def get_cart():
-    """Retrieve the current user's cart from the session, or an empty list if not set."""
-    return session.get("cart", [])
+def commit_users(user_ids, deleted=False):
+    """
+    Commit a change to some users' rows and drop their cached snapshots (here and in the other worker processes).
+    - deleted=True also drops their owned games and carts.
+    """
+    kinds = ("user", "owned", "cart") if deleted else ("user",)
+    if len(user_ids) > 50:
+        # Cheaper to have every process drop these caches entirely than to send one change per user
+        for kind in kinds:
+            cache_sync.bump(kind)
+    else:
+        for user_id in user_ids:
+            for kind in kinds:
+                cache_sync.bump(f"{kind}:{user_id}")
+    db.session.commit()
+    for user_id in user_ids:
+        user_snapshots.invalidate(user_id)
+        if deleted:
+            owned_games.invalidate(user_id)
+            carts.invalidate(user_id)
 
-def save_cart(cart):
-    """Save the user's cart to the session."""
-    session["cart"] = cart
+def is_ajax():
+    """True if the request came from our fetch() calls (they only want a page fragment)."""
+    return request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
-@app.route("/")
+def fragment_response(body, etag):
+    """
+    Response for a cached fragment that browsers revalidate with If-None-Match.
+    - Answers 304 Not Modified (no body) when the client already has this version.
+    """
+    response = make_response(body)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+def busy_response(template, **context):
+    """503 for a form page when the password hashing pool is full (see passwords.py); the user can just retry."""
+    flash("The server is busy right now, please try again in a moment.", "warning")
+    response = make_response(render_template(template, **context), 503)
+    response.headers["Retry-After"] = "1"
+    return response
+
+def commit_cart(user_id):
+    """Commit a change to a user's cart and drop the cached copy (here and in the other worker processes)."""
+    cache_sync.bump(f"cart:{user_id}")
+    db.session.commit()
+    carts.invalidate(user_id)
+
+@bp.app_template_global()
+def game_card(game, is_inventory=False):
+    """One game's card for game_cards.html, rendered once and reused for every user and filter."""
+    is_inventory = bool(is_inventory)
+    return Markup(game_cards.get_or_render(
+        game,
+        is_inventory,
+        lambda: current_app.jinja_env.get_template("game_card.html").render(game=game, is_inventory=is_inventory),
+    ))
+
+@bp.app_context_processor
+def cart_badge():
+    """Lets base.html show how many games are in the cart (a cached count, no query per page)."""
+    def cart_count():
+        return carts.count(current_user.id) if current_user.is_authenticated else 0
+    return {"cart_count": cart_count}
+
+@bp.route("/")
 def home():
     """Redirect users from the home page to the dashboard."""
-    return redirect(url_for("dashboard"))
+    return redirect(url_for("main.dashboard"))
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     """
     Register a new user.
@@ -51,22 +132,26 @@ def register():
     """
     if current_user.is_authenticated:
         # Prevent already logged-in users from registering again
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
 
+    from forms import RegisterForm
     form = RegisterForm()
     # If the form was submitted (POST request) and passed all validation checks
     if form.validate_on_submit():
         # Create a new user and save to the database
         user = User(email=form.email.data)
-        user.set_password(form.password.data)  # Hash the password
+        try:
+            user.set_password(form.password.data)  # Hash the password
+        except HasherBusy:
+            return busy_response("register.html", form=form)
         db.session.add(user)
         db.session.commit()
         flash("Registration successful. Please log in.", "success")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
     # Render registration form (GET or failed POST)
     return render_template("register.html", form=form)
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     """
     Log in an existing user.
@@ -74,195 +159,264 @@ def login():
     - Authenticates credentials and logs in the user.
     """
     if current_user.is_authenticated:
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
 
+    from forms import LoginForm
     form = LoginForm()
     if form.validate_on_submit():
         # Check if user exists and password is correct
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+        except HasherBusy:
+            return busy_response("login.html", form=form)
+        if valid:
+            # Hashed with an older method or cost: upgrade it while we have the password
+            try:
+                if password_hasher.needs_rehash(user.password_hash):
+                    user.set_password(form.password.data)
+                    db.session.commit()
+            except HasherBusy:
+                pass  # Try again at the next login
             login_user(user)  # Log in the user
             session.permanent = False
-            return redirect(url_for("dashboard"))
+            return redirect(url_for("main.dashboard"))
         else:
             flash("Invalid email or password", "danger")
     # Render login form (GET or failed POST)
     return render_template("login.html", form=form)
 
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     """Log out the current user and redirect to the login page."""
     logout_user()
-    return redirect(url_for("login"))
+    return redirect(url_for("main.login"))
 
 # Add to Cart Route
-@app.route("/add_to_cart/<int:game_id>", methods=["POST"])
+@bp.route("/add_to_cart/<int:game_id>", methods=["POST"])
 @login_required
 def add_to_cart(game_id):
     """Add a game to the current user's cart (if not already present)."""
-    cart = get_cart()
-    if game_id not in cart:
-        cart.append(game_id)
-        save_cart(cart)
+    if add_cart_items(current_user.id, [game_id]):
+        commit_cart(current_user.id)
         flash("Game added to cart!", "success")
     else:
         flash("Game is already in your cart.", "warning")
     # Redirect back to the previous page or catalogue if referrer missing
-    return redirect(request.referrer or url_for("catalogue"))
+    return redirect(request.referrer or url_for("main.catalogue"))
+
+# Batch Add to Cart Route
+@bp.route("/cart/add", methods=["POST"])
+@login_required
+def add_many_to_cart():
+    """
+    Add several games to the cart in one request (form field 'game_ids', repeated).
+    - Games already in the cart are skipped.
+    - AJAX requests get JSON with the number added and the new cart size.
+    """
+    game_ids = request.form.getlist("game_ids", type=int)
+    added = add_cart_items(current_user.id, game_ids) if game_ids else 0
+    if added:
+        commit_cart(current_user.id)
+    if is_ajax():
+        return jsonify(added=added, count=carts.count(current_user.id))
+    if added:
+        flash(f"{added} game(s) added to cart!", "success")
+    else:
+        flash("Those games are already in your cart.", "warning")
+    return redirect(request.referrer or url_for("main.catalogue"))
 
 # Remove from Cart Route
-@app.route("/remove_from_cart/<int:game_id>", methods=["POST"])
+@bp.route("/remove_from_cart/<int:game_id>", methods=["POST"])
 @login_required
 def remove_from_cart(game_id):
     """Remove a game from the user's cart."""
-    cart = get_cart()
-    if game_id in cart:
-        cart.remove(game_id)
-        save_cart(cart)
+    if remove_cart_items(current_user.id, [game_id]):
+        commit_cart(current_user.id)
         flash("Game removed from cart.", "success")
     else:
         flash("Game not found in cart.", "warning")
-    return redirect(url_for("cart"))
+    return redirect(url_for("main.cart"))
 
 # Cart Page
-@app.route("/cart")
+@bp.route("/cart")
 @login_required
 def cart():
     """Show the current user's cart and games within it."""
-    cart = get_cart()
+    cart = carts.get(current_user.id)
     games = Game.query.filter(Game.id.in_(cart)).all() if cart else []
     return render_template("cart.html", games=games)
 
 # Checkout Route
-@app.route("/checkout", methods=["POST"])
+@bp.route("/checkout", methods=["POST"])
 @login_required
 def checkout():
     """
     Purchase all games in the cart.
-    - Adds the games to the user's inventory.
-    - Clears the cart after successful purchase.
+    - Adds the games to the user's inventory in one statement (already owned games are skipped).
+    - Empties the cart of exactly those games, in the same transaction.
+    - Counts the new games in the "players also own" index, also in the same transaction.
     """
-    cart = get_cart()
+    # Read the cart from the database, not the cache: another device may have just changed it
+    cart = cart_game_ids(current_user.id)
     if not cart:
         flash("Your cart is empty!", "warning")
-        return redirect(url_for("cart"))
-    games = Game.query.filter(Game.id.in_(cart)).all()
-    # Add each game to user's inventory if not already owned
-    for game in games:
-        if game not in current_user.purchased_games:
-            current_user.purchased_games.append(game)
-    db.session.commit()
-    save_cart([])  # Clear cart
-    flash("Purchase successful! Games added to your inventory.", "success")
-    return redirect(url_for("inventory"))
+        return redirect(url_for("main.cart"))
+    new_ids, already_owned = purchase_games(current_user.id, cart)
+    newly_purchased = len(new_ids)
+    remove_cart_items(current_user.id, cart)
+    recommendations.record_purchases(current_user.id, new_ids)
+    cache_sync.bump(f"owned:{current_user.id}")  # Tell the other worker processes
+    commit_cart(current_user.id)
+    owned_games.invalidate(current_user.id)  # Ownership changed
+    if newly_purchased:
+        message = f"Purchase successful! {newly_purchased} game(s) added to your inventory."
+        if already_owned:
+            message += f" {already_owned} game(s) were already owned."
+        flash(message, "success")
+    else:
+        flash("You already own every game in your cart.", "info")
+    return redirect(url_for("main.inventory"))
 
-@app.route("/dashboard")
+@bp.route("/dashboard")
 @login_required
 def dashboard():
     """Render the dashboard page for logged-in users."""
     return render_template("dashboard.html")
 
-@app.route("/inventory")
+@bp.route("/inventory")
 @login_required
 def inventory():
-    """Show all games purchased/owned by the current user."""
-    user_games = current_user.purchased_games.all()
-    return render_template("inventory.html", games=user_games, is_inventory=True)
+    """Show the games purchased/owned by the current user, one page at a time (by title)."""
+    owned = owned_games.get(current_user.id)
+    user_games, next_cursor = keyset_page(
+        Game.query.filter(Game.id.in_(owned_ids_select(owned))),
+        [Game.title.collate("NOCASE"), Game.id],
+        "title",
+        cursor=request.args.get("cursor"),
+        per_page=current_app.config["PAGE_SIZE"],
+    )
+    template = "game_cards.html" if is_ajax() else "inventory.html"
+    return render_template(template, games=user_games, is_inventory=True, next_url=next_page_url(next_cursor))
 
-@app.route("/catalogue", methods=["GET"])
+@bp.route("/catalogue", methods=["GET"])
 @login_required
 def catalogue():
     """
     Show the game store catalogue.
     - Supports filtering by genre, title, price, and size.
-    - Excludes games already owned by the user.
+    - Excludes games already owned by the user (from the owned-games cache).
+    - The full page also shows facet counts (games per genre, price/size histograms);
+      script.js refreshes them from /api/v1/games?facets=1.
     """
-    games = Game.query.all()
-    user_games = current_user.purchased_games.all()
-    user_game_ids = {g.id for g in user_games}
-
-    # Build unique genre list
-    unique_genres = set()
-    for g in games:
-        if g.genre:
-            for genre in g.genre.split(','):
-                unique_genres.add(genre.strip())
-    all_genres = sorted(unique_genres)
-
-    # Attach numeric price/size to each game for filtering
-    for g in games:
-        g.price_num = parse_price(g.price)
-        g.size_num = parse_size(g.size)
-
-    # Find min/max for sliders
-    price_values = [g.price_num for g in games]
-    size_values = [g.size_num for g in games]
-    min_price_val = min(price_values) if price_values else 0
-    max_price_val = max(price_values) if price_values else 100
-    min_size_val = min(size_values) if size_values else 0
-    max_size_val = max(size_values) if size_values else 100
-
-    # Get current slider/filter values from request args (with defaults)
-    min_price = request.args.get("min_price", min_price_val, type=float)
-    max_price = request.args.get("max_price", max_price_val, type=float)
-    min_size = request.args.get("min_size", min_size_val, type=float)
-    max_size = request.args.get("max_size", max_size_val, type=float)
-    title = request.args.get("title", "", type=str)
-    selected_genres = request.args.getlist("genres")
-
-    # Apply filters to games
-    filtered_games = []
-    for g in games:
-        # Skip games already owned by the user
-        if g.id in user_game_ids:
-            continue  
-        # Title filter
-        if title and title.lower() not in g.title.lower():
-            continue
-        # Genre filter (match any selected genre)
-        game_genres = [x.strip() for x in g.genre.split(',')] if g.genre else []
-        if selected_genres:
-            if not any(genre in game_genres for genre in selected_genres):
-                continue
-        # Price/size filters
-        if g.price_num < min_price or g.price_num > max_price:
-            continue
-        if g.size_num < min_size or g.size_num > max_size:
-            continue
-        filtered_games.append(g)
-
-    # AJAX update: return just the games grid if it's an AJAX request
-    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-        return render_template("game_cards.html", games=filtered_games)
-
-    # Render full catalogue page
-    return render_template(
+    index = catalogue_index.ensure_loaded()
+    # Same filter arguments as /api/v1/games; bounds at the ends of the sliders come back as None
+    filters = parse_catalogue_filters(request.args, index)
+    cursor = request.args.get("cursor")
+    owned = owned_games.get(current_user.id)
+
+    def render_games(template, **context):
+        """Run the filter query for one page and render it with 'template'."""
+        # Apply all filters (and skip games the user owns) in a single indexed query
+        result = catalogue_query(**filters._asdict(), exclude_owned=owned)
+        # Only load one page; the rest is fetched as the user scrolls
+        filtered_games, next_cursor = keyset_page(
+            result.query,
+            result.sort_columns,
+            result.sort,
+            cursor=cursor,
+            per_page=current_app.config["PAGE_SIZE"],
+        )
+        return render_template(template, games=filtered_games, next_url=next_page_url(next_cursor), **context)
+
+    # AJAX update: return just the games grid, straight from the fragment cache when possible.
+    # The key covers the normalized filters plus the catalogue and ownership versions,
+    # so any change to the data naturally produces a new key.
+    if is_ajax():
+        key = (
+            filters._replace(title=filters.title.lower()),
+            cursor,
+            current_app.config["PAGE_SIZE"],
+            index.version,
+            owned.version,
+        )
+        body, etag = catalogue_fragments.get_or_render(key, lambda: render_games("game_cards.html"))
+        return fragment_response(body, etag)
+
+    # Render full catalogue page (sliders start at their ends unless a bound was given)
+    def start(value, default):
+        return default if value is None else value
+
+    return render_games(
         "catalogue.html",
-        games=filtered_games,
-        all_genres=all_genres,
-        min_price_val=min_price_val,
-        max_price_val=max_price_val,
-        min_price=min_price,
-        max_price=max_price,
-        min_size_val=min_size_val,
-        max_size_val=max_size_val,
-        min_size=min_size,
-        max_size=max_size,
-        selected_genres=selected_genres,
-        title=title,
+        all_genres=index.all_genres(),
+        min_price_val=index.min_price_val,
+        max_price_val=index.max_price_val,
+        min_price=start(filters.min_price, index.min_price_val),
+        max_price=start(filters.max_price, index.max_price_val),
+        min_size_val=index.min_size_val,
+        max_size_val=index.max_size_val,
+        min_size=start(filters.min_size, index.min_size_val),
+        max_size=start(filters.max_size, index.max_size_val),
+        selected_genres=filters.genres,
+        title=filters.title,
+        sort=filters.sort,
+        facets=facet_index.counts(index, filters, owned),
     )
 
-@app.route("/game/<int:game_id>")
+@bp.route("/game/<int:game_id>")
 @login_required
 def game_details(game_id):
-    """Display details for a specific game."""
-    game = Game.query.get_or_404(game_id)
+    """
+    Display details for a specific game, with the games its players also own.
+    - The game's version and updated_at come from one indexed lookup (no ORM object). With what the navigation
+      bar shows this user they become the ETag, so a revalidation gets 304 without rendering anything.
+      (updated_at because ids are reused: a game added after a delete starts again at version 1.)
+    - No Last-Modified: the page also depends on the viewer, which a modification time can't capture,
+      so a bare If-Modified-Since must not get a 304.
+    - The game part of the page is rendered once per (game, version, is_inventory) and kept in game_pages;
+      delete_game evicts it.
+    """
     # Check if user came from inventory (for back button context)
     is_inventory = request.args.get('is_inventory', 'false').lower() == 'true'
-    return render_template("game_details.html", game=game, is_inventory=is_inventory)
-
-@app.route("/account", methods=["GET", "POST"])
+    row = db.session.execute(
+        db.select(Game.title, Game.version, Game.updated_at).where(Game.id == game_id)
+    ).first()
+    if row is None:
+        abort(404)
+    # The strip of related games changes with other users' purchases, so cached pages are also refreshed now and then
+    refresh = int(time.time() // current_app.config["GAME_PAGE_REFRESH"])
+    key = (game_id, row.version, row.updated_at, is_inventory, refresh)
+
+    # Flashed messages are shown once, so a page carrying one is never reused
+    conditional = "_flashes" not in session
+    if conditional:
+        viewer = f"{current_user.id}:{current_user.email}:{current_user.is_admin}:{carts.count(current_user.id)}"
+        etag = hashlib.sha1(repr((key, viewer)).encode()).hexdigest()
+
+    def with_validators(response):
+        if conditional:
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    if conditional and not is_resource_modified(request.environ, etag=etag):
+        return with_validators(make_response("", 304))
+
+    body = game_pages.get(key)
+    if body is None:
+        game = db.session.get(Game, game_id)
+        if game is None:
+            abort(404)
+        body = Markup(render_template(
+            "game_details_body.html", game=game, is_inventory=is_inventory,
+            related_games=recommendations.related_games(game_id),
+        ))
+        game_pages.set(key, body)
+    return with_validators(make_response(render_template("game_details.html", title=row.title, body=body)))
+
+@bp.route("/account", methods=["GET", "POST"])
 @login_required
 def account():
     """
@@ -271,33 +425,43 @@ def account():
     - Email can be updated independently.
     """
     # Create the edit account form, passing the current email for validation
+    from forms import EditAccountForm
     form = EditAccountForm(original_email=current_user.email)
 
     # Process form submission
     if form.validate_on_submit():
+        # current_user is a read-only snapshot: changes go to the full row
+        user = current_user.record
+
         # 1. Handle email change if different from current email
-        if form.email.data != current_user.email:
-            current_user.email = form.email.data
-            flash("Your email has been updated.", "success")
+        email_changed = form.email.data != user.email
+        if email_changed:
+            user.email = form.email.data
 
         # 2. Handle password change, if any password fields are filled
         # Only attempt change if any password fields are filled in
         if form.current_password.data or form.new_password.data or form.confirm_new_password.data:
-            # a) Require all three password fields for a change
-            if not (form.current_password.data and form.new_password.data and form.confirm_new_password.data):
-                flash("To change your password, fill in all password fields.", "danger")
-            # b) Validate current password is correct
-            elif not current_user.check_password(form.current_password.data):
-                flash("Current password is incorrect.", "danger")
-            else:
-                # c) Set the new password
-                current_user.set_password(form.new_password.data)
-                flash("Your password has been updated.", "success")
+            try:
+                # a) Require all three password fields for a change
+                if not (form.current_password.data and form.new_password.data and form.confirm_new_password.data):
+                    flash("To change your password, fill in all password fields.", "danger")
+                # b) Validate current password is correct
+                elif not user.check_password(form.current_password.data):
+                    flash("Current password is incorrect.", "danger")
+                else:
+                    # c) Set the new password
+                    user.set_password(form.new_password.data)
+                    flash("Your password has been updated.", "success")
+            except HasherBusy:
+                db.session.rollback()  # Don't save the email change alone either
+                return busy_response("edit_account.html", form=form)
+        if email_changed:
+            flash("Your email has been updated.", "success")
 
         # Commit changes to the database (email and/or password)
-        db.session.commit()
+        commit_users([user.id])
         # Redirect back to the account page to avoid form re-submission
-        return redirect(url_for("account"))
+        return redirect(url_for("main.account"))
 
     # On GET, pre-fill form with current email
     elif request.method == "GET":
@@ -306,83 +470,187 @@ def account():
     # Render the account edit template
     return render_template("edit_account.html", form=form)
 
-@app.route("/users")
+@bp.route("/users")
 @login_required
 def users():
     """
     Admin-only view of all registered users.
     - Redirects non-admins back to dashboard.
+    - 'q' searches by email prefix (case-insensitive, in email order, from an index).
+    - Loads one page at a time; AJAX requests get just the next rows.
     """
     if not current_user.is_admin:
         flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    # Show a list of all users in the system
-    all_users = User.query.all()
-    return render_template("users.html", users=all_users)
-
-@app.route("/admin/delete_user/<int:user_id>", methods=["POST"])
+        return redirect(url_for("main.dashboard"))
+
+    q = request.args.get("q", "").strip()
+    query = User.query
+    if q:
+        # A range on lower(email) rather than LIKE, so SQLite can use ix_user_email_lower
+        prefix = q.lower()
+        email = db.func.lower(User.email)
+        query = query.filter(email >= prefix, email < prefix + "\U0010ffff")
+        sort_columns, key = [email, User.id], "email"
+    else:
+        sort_columns, key = [User.id], "id"
+
+    # Show the users in the system, one page at a time
+    page_users, next_cursor = keyset_page(
+        query,
+        sort_columns,
+        key,
+        cursor=request.args.get("cursor"),
+        per_page=current_app.config["ADMIN_PAGE_SIZE"],
+    )
+    # Purchase counts for the whole page in one grouped query
+    counts = purchase_counts([user.id for user in page_users])
+    next_url = next_page_url(next_cursor)
+    if is_ajax():
+        return render_template("user_rows.html", users=page_users, purchase_counts=counts, next_url=next_url,
+                               standalone=True)
+    return render_template("users.html", users=page_users, purchase_counts=counts, next_url=next_url, q=q)
+
+@bp.route("/admin/delete_user/<int:user_id>", methods=["POST"])
 @login_required
 def delete_user(user_id):
-    """Admin deletes a user, except themselves."""
+    """Admin deletes a user (with their purchases and cart), except administrators."""
     if not current_user.is_admin:
         flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     user = User.query.get_or_404(user_id)
-    if user.id == current_user.id:
+    if user.is_admin:
         flash("You can't delete Administrators!", "warning")
-        return redirect(url_for("users"))
-    db.session.delete(user)
-    db.session.commit()
-    flash(f"User {user.email} deleted.", "success")
-    return redirect(url_for("users"))
+        return redirect(url_for("main.users"))
+    email = user.email
+    commit_users(delete_users([user_id]), deleted=True)
+    flash(f"User {email} deleted.", "success")
+    return redirect(url_for("main.users"))
 
-@app.route("/admin/promote_user/<int:user_id>", methods=["POST"])
+@bp.route("/admin/promote_user/<int:user_id>", methods=["POST"])
 @login_required
 def promote_user(user_id):
     """Admin promotes a user to admin status."""
     if not current_user.is_admin:
         flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     user = User.query.get_or_404(user_id)
     if user.is_admin:
         flash("User is already an admin.", "info")
-        return redirect(url_for("users"))
-    user.is_admin = True
-    db.session.commit()
+        return redirect(url_for("main.users"))
+    commit_users(promote_users([user_id]))
     flash(f"User {user.email} promoted to admin.", "success")
-    return redirect(url_for("users"))
+    return redirect(url_for("main.users"))
 
-@app.route("/admin/games")
+@bp.route("/admin/users/bulk", methods=["POST"])
+@login_required
+def bulk_users():
+    """
+    Admin promotes or deletes every selected user in one transaction.
+    - Form fields: 'action' ("promote" or "delete") and 'user_ids' (repeated).
+    - Administrators are never deleted.
+    """
+    if not current_user.is_admin:
+        flash("Access denied.", "danger")
+        return redirect(url_for("main.dashboard"))
+    user_ids = set(request.form.getlist("user_ids", type=int)) - {current_user.id}
+    action = request.form.get("action")
+    if action not in ("promote", "delete"):
+        abort(400)
+    if not user_ids:
+        flash("No users selected.", "warning")
+    elif action == "promote":
+        promoted = promote_users(user_ids)
+        commit_users(promoted)
+        flash(f"{len(promoted)} user(s) promoted to admin.", "success")
+    else:
+        deleted = delete_users(user_ids)
+        commit_users(deleted, deleted=True)
+        skipped = len(user_ids) - len(deleted)
+        message = f"{len(deleted)} user(s) deleted."
+        if skipped:
+            message += f" {skipped} administrator(s) or missing user(s) skipped."
+        flash(message, "success")
+    # Back to the same search/page
+    return redirect(request.referrer or url_for("main.users"))
+
+@bp.route("/admin/games")
 @login_required
 def games_admin():
-    """Admin-only view of all games in the system."""
+    """Admin-only view of all games in the system (paginated like the users list)."""
+    if not current_user.is_admin:
+        flash("Access denied.", "danger")
+        return redirect(url_for("main.dashboard"))
+    games, next_cursor = keyset_page(
+        Game.query,
+        [Game.id],
+        "id",
+        cursor=request.args.get("cursor"),
+        per_page=current_app.config["ADMIN_PAGE_SIZE"],
+    )
+    next_url = next_page_url(next_cursor)
+    if is_ajax():
+        return render_template("game_rows.html", games=games, next_url=next_url, standalone=True)
+    return render_template("games_admin.html", games=games, next_url=next_url)
+
+@bp.route("/admin/metrics")
+@login_required
+def metrics_admin():
+    """Admin-only view of request latency, SQL usage per endpoint, slow queries and cache hit rates."""
     if not current_user.is_admin:
         flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-    games = Game.query.all()
-    return render_template("games_admin.html", games=games)
+        return redirect(url_for("main.dashboard"))
+    endpoints, slow_queries = metrics.collector.snapshot()
+    return render_template(
+        "metrics.html",
+        endpoints=endpoints,
+        slow_queries=slow_queries,
+        slow_query_ms=current_app.config["SLOW_QUERY_MS"],
+        caches=cache_stats(),
+    )
 
-@app.route("/admin/delete_game/<int:game_id>", methods=["POST"])
+@bp.route("/metrics")
+def metrics_text():
+    """
+    The same metrics in Prometheus text format.
+    - Readable by admins, or by a scraper sending 'Authorization: Bearer <METRICS_TOKEN>'.
+    """
+    token = current_app.config.get("METRICS_TOKEN")
+    has_token = token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not has_token and not (current_user.is_authenticated and current_user.is_admin):
+        abort(403)
+    body = metrics.collector.prometheus_text(cache_stats())
+    return body, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@bp.route("/admin/delete_game/<int:game_id>", methods=["POST"])
 @login_required
 def delete_game(game_id):
     """Admin deletes a game from the catalogue."""
     if not current_user.is_admin:
         flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     game = Game.query.get_or_404(game_id)
+    db.session.execute(cart_item.delete().where(cart_item.c.game_id == game_id))
+    recommendations.forget_game(game_id)
     db.session.delete(game)
+    cache_sync.bump("owned")
+    cache_sync.bump("cart")
+    cache_sync.bump("catalogue")
+    cache_sync.bump(f"game:{game_id}")
     db.session.commit()
+    owned_games.invalidate_all()  # The game disappears from everyone's inventory
+    carts.invalidate_all()  # ... and from every cart
+    evict_game(game_id)  # Cached card and page: its id can be given to a new game
+    catalogue_index.invalidate()  # Genre list/slider bounds may have changed
     flash(f"Game '{game.title}' deleted.", "success")
-    return redirect(url_for("games_admin"))
+    return redirect(url_for("main.games_admin"))
 
-@app.route("/admin/edit_game/<int:game_id>", methods=["GET", "POST"])
+@bp.route("/admin/edit_game/<int:game_id>", methods=["GET", "POST"])
 @login_required
 def edit_game(game_id):
     """Admin edits game information (title, description, price, etc)."""
     if not current_user.is_admin:
         flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     game = Game.query.get_or_404(game_id)
     if request.method == "POST":
         # Update game fields from submitted form data
@@ -394,42 +662,78 @@ def edit_game(game_id):
         game.genre = request.form["genre"]
         game.size = request.form["size"]
         game.video_link = request.form["video_link"]
+        game.sync_typed_fields()  # Keep price_cents/size_mb/genres in step with the strings
+        game.touch()  # New version: its card, details page and ETag change (other games' cards are reused)
+        cache_sync.bump("catalogue")
         db.session.commit()
+        catalogue_index.invalidate()  # Genre list/slider bounds may have changed
         flash("Game updated successfully.", "success")
-        return redirect(url_for("games_admin"))
+        return redirect(url_for("main.games_admin"))
     # Render edit form for GET requests
     return render_template("edit_game.html", game=game)
 
-def parse_price(price_str):
-    """Convert a price string like '$19.99' or 'Free' to a float value."""
-    if not price_str or "free" in price_str.lower():
-        return 0.0
-    # Remove $ and commas, then convert
-    try:
-        return float(price_str.replace("$", "").replace(",", "").strip())
-    except Exception:
-        return 0.0
-
-def parse_size(size_str):
-    """Convert a size string like '2 GB' or '900 MB' to a float in GB."""
-    if not size_str:
-        return 0.0
-    size_str = size_str.strip().lower()
-    try:
-        if size_str.endswith("gb"):
-            return float(size_str[:-2].strip())
-        if size_str.endswith("mb"):
-            return float(size_str[:-2].strip()) / 1024
-        return float(size_str)
-    except Exception:
-        return 0.0
+def create_app(config=Config):
+    """
+    Build a configured app instance.
+    - 'config' is a config class or its import path, e.g. "config.ProductionConfig".
+    - Each WSGI worker process calls this once (see wsgi.py).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)  # Load settings like SECRET_KEY and DB path
+
+    # Keep compiled templates on disk, so a new worker loads them instead of compiling each one again
+    if app.config["TEMPLATE_CACHE_DIR"]:
+        os.makedirs(app.config["TEMPLATE_CACHE_DIR"], exist_ok=True)
+    app.jinja_options = {
+        **app.jinja_options,
+        "bytecode_cache": FileSystemBytecodeCache(app.config["TEMPLATE_CACHE_DIR"]),
+    }
+
+    # Initialize the database with the app (plus the SQLite PRAGMAs of this config)
+    database.init_app(app)
+
+    # Register the 'flask upgrade-db' command
+    migrations.init_app(app)
+
+    # Register 'flask games import/export'
+    catalogue_io.init_app(app)
+
+    # Register 'flask recommendations rebuild'
+    recommendations.init_app(app)
+
+    # Register 'flask warm-up' (workers run it at start-up, see gunicorn.conf.py)
+    warmup.init_app(app)
+
+    # Time every request and count its SQL statements
+    metrics.init_app(app)
+
+    # Register 'flask images build' and the responsive_image() template helper
+    images.init_app(app)
+
+    # Serve the fingerprinted CSS/JS bundles from /assets/ and register 'flask assets'
+    assets.init_app(app)
+
+    # Set up Flask-Login, and the pool that hashes passwords
+    login_manager.init_app(app)
+    password_hasher.init_app(app)
+
+    # Drop cached data that another worker process has changed
+    cache_sync.interval = app.config["CACHE_SYNC_INTERVAL"]
+    # ... and re-read logged-in users at least this often anyway
+    user_snapshots.ttl = app.config["USER_CACHE_TTL"]
+    app.before_request(cache_sync.poll)
+
+    app.register_blueprint(bp)
+    app.register_blueprint(api.bp)
+    return app
 
 if __name__ == "__main__":
     """
     Initialize the database, seed default users, and start the development server.
     This block runs only when this file is executed directly (not imported), i.e. "python app.py".
     """
+    app = create_app()
     with app.app_context():
-        db.create_all()  # Create tables if they don't exist
+        migrations.upgrade_database()  # Create tables if they don't exist and migrate older databases
 
     app.run(debug=True)  # Start the server with debug mode (auto-reloads on changes)
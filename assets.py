@@ -0,0 +1,232 @@
+# Static asset pipeline: vendored libraries, fingerprinted CSS/JS bundles and precompressed copies
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+import click
+from flask import abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+from utils import JsonManifest
+
+STATIC_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+ONE_YEAR = 365 * 24 * 60 * 60
+
+CDN = "https://cdn.jsdelivr.net/npm"
+# Third-party files kept under static/vendor/ (by 'flask assets vendor'), with the CDN copy
+# they're downloaded from. Until they're vendored, pages load them from the CDN instead.
+VENDOR_FILES = {
+    "vendor/bootstrap/bootstrap.min.css": f"{CDN}/bootstrap@5.3.0/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/bootstrap.bundle.min.js": f"{CDN}/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js",
+    "vendor/bootstrap-icons/bootstrap-icons.min.css": f"{CDN}/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff2": f"{CDN}/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff2",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff": f"{CDN}/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff",
+    "vendor/nouislider/nouislider.min.css": f"{CDN}/nouislider@15.7.1/dist/nouislider.min.css",
+    "vendor/nouislider/nouislider.min.js": f"{CDN}/nouislider@15.7.1/dist/nouislider.min.js",
+}
+
+# Bundles and their source files (relative to static/), concatenated in this order
+BUNDLES = {
+    "app.css": [
+        "vendor/bootstrap/bootstrap.min.css",
+        "vendor/bootstrap-icons/bootstrap-icons.min.css",
+        "styles.css",
+    ],
+    "app.js": ["pager.js", "vendor/bootstrap/bootstrap.bundle.min.js"],
+    "catalogue.css": ["vendor/nouislider/nouislider.min.css"],
+    "catalogue.js": ["vendor/nouislider/nouislider.min.js", "script.js"],
+}
+
+# Files worth precompressing (fonts like woff2 are compressed already)
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".ttf")
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _fingerprint(name, data):
+    """'app.css' -> 'app.<hash>.css'"""
+    stem, ext = os.path.splitext(os.path.basename(name))
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+def _write(filename, data):
+    """Write one built file plus its .gz (and .br, if brotli is installed) siblings."""
+    path = os.path.join(DIST_DIR, filename)
+    with open(path, "wb") as f:
+        f.write(data)
+    if not filename.endswith(COMPRESSIBLE):
+        return
+    compressed = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        compressed[".br"] = brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    for ext, body in compressed.items():
+        # Only keep compressed copies that are actually smaller
+        if len(body) < len(data):
+            with open(path + ext, "wb") as f:
+                f.write(body)
+
+def _rewrite_css_urls(css, source, manifest):
+    """
+    Point relative url(...)s in a CSS file (e.g. icon fonts) at fingerprinted copies in dist/,
+    since the bundle is served from a different folder than the original file.
+    """
+    folder = os.path.dirname(source)
+
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        target = os.path.normpath(os.path.join(folder, url.split("?")[0].split("#")[0])).replace(os.sep, "/")
+        target_file = os.path.join(STATIC_DIR, target)
+        if not os.path.isfile(target_file):
+            return match.group(0)
+        if target not in manifest:
+            with open(target_file, "rb") as f:
+                data = f.read()
+            manifest[target] = _fingerprint(target, data)
+            _write(manifest[target], data)
+        return f'url("{manifest[target]}")'
+
+    return CSS_URL.sub(replace, css)
+
+def build_assets(clean=False, echo=print):
+    """Bundle, minify and fingerprint every bundle into static/dist/ and write the manifest."""
+    import rcssmin
+    import rjsmin
+
+    missing = [s for sources in BUNDLES.values() for s in sources if not os.path.isfile(os.path.join(STATIC_DIR, s))]
+    if missing:
+        raise click.ClickException(
+            "Missing source files (run 'flask assets vendor' first): " + ", ".join(missing)
+        )
+
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {}
+    for bundle, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(STATIC_DIR, source), encoding="utf-8") as f:
+                text = f.read()
+            if bundle.endswith(".css"):
+                text = rcssmin.cssmin(_rewrite_css_urls(text, source, manifest))
+            elif not source.endswith(".min.js"):
+                text = rjsmin.jsmin(text)
+            parts.append(text)
+        # ';' keeps concatenated scripts from running into each other
+        data = (";\n" if bundle.endswith(".js") else "\n").join(parts).encode("utf-8")
+        manifest[bundle] = _fingerprint(bundle, data)
+        _write(manifest[bundle], data)
+        echo(f"  {bundle} -> {manifest[bundle]} ({len(data) / 1024:.1f} KB)")
+
+    if clean:
+        # Old fingerprinted files are kept by default, so pages cached before a deploy still work
+        keep = set(manifest.values())
+        for name in os.listdir(DIST_DIR):
+            base = name[:-3] if name.endswith((".br", ".gz")) else name
+            if base != "manifest.json" and base not in keep:
+                os.remove(os.path.join(DIST_DIR, name))
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    echo(f"Wrote {MANIFEST_PATH}")
+    return manifest
+
+def vendor_assets(echo=print):
+    """Download the third-party files in VENDOR_FILES into static/vendor/."""
+    # Only needed by this command, so web workers don't import the HTTP client at start-up
+    import urllib.request
+
+    for path, url in VENDOR_FILES.items():
+        target = os.path.join(STATIC_DIR, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response, open(target, "wb") as f:
+            shutil.copyfileobj(response, f)
+        echo(f"  {url} -> static/{path}")
+
+
+# Shared manifest of the last build
+asset_manifest = JsonManifest(MANIFEST_PATH)
+
+
+def asset_url(filename):
+    """
+    url_for('static', filename=...) that knows about the asset build.
+    - Built files (bundles, fonts) resolve to their fingerprinted /assets/ URL.
+    - Anything else is a normal static URL.
+    """
+    hashed = asset_manifest.get(filename)
+    if hashed:
+        return url_for("assets", filename=hashed)
+    return url_for("static", filename=filename)
+
+def asset_urls(bundle):
+    """
+    URLs to load for a bundle: the single fingerprinted file once it's built,
+    otherwise each source file (vendored copy if present, else the CDN).
+    """
+    if asset_manifest.get(bundle):
+        return [asset_url(bundle)]
+    urls = []
+    for source in BUNDLES[bundle]:
+        if source in VENDOR_FILES and not os.path.isfile(os.path.join(STATIC_DIR, source)):
+            urls.append(VENDOR_FILES[source])
+        else:
+            urls.append(url_for("static", filename=source))
+    return urls
+
+def serve_asset(filename):
+    """
+    Serve a fingerprinted file from static/dist/.
+    - Cached for a year as immutable: a changed file gets a new name.
+    - Sends the precompressed .br or .gz copy when the browser accepts it.
+    """
+    path = safe_join(DIST_DIR, filename)
+    if path is None or filename == "manifest.json" or not os.path.isfile(path):
+        abort(404)
+
+    send_name, encoding = filename, None
+    for name, ext in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[name] and os.path.isfile(path + ext):
+            send_name, encoding = filename + ext, name
+            break
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    response = send_from_directory(DIST_DIR, send_name, mimetype=mimetype, max_age=ONE_YEAR)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_app(app):
+    """Register the /assets/ route, the asset_url()/asset_urls() template helpers and 'flask assets'."""
+    app.add_url_rule("/assets/<path:filename>", "assets", serve_asset)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
+
+    @app.cli.group("assets")
+    def assets_group():
+        """Vendor, bundle and fingerprint the CSS/JS."""
+
+    @assets_group.command("vendor")
+    def vendor_command():
+        """Download Bootstrap, Bootstrap Icons and noUiSlider into static/vendor/."""
+        vendor_assets(echo=click.echo)
+
+    @assets_group.command("build")
+    @click.option("--clean", is_flag=True, help="Delete files left over from earlier builds.")
+    def build_command(clean):
+        """Bundle, minify, fingerprint and precompress the CSS/JS into static/dist/."""
+        try:
+            import rcssmin  # noqa: F401
+            import rjsmin  # noqa: F401
+        except ImportError:
+            raise click.ClickException("rcssmin and rjsmin are needed to build assets: pip install rcssmin rjsmin")
+        build_assets(clean=clean, echo=click.echo)
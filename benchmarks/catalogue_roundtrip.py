@@ -0,0 +1,76 @@
+"""
+Round-trip check for 'flask games export' / 'flask games import'.
+
+Exports every game of a database (app.db by default) as CSV and as JSONL, then
+imports each file back into a throwaway copy of that database. Then checks:
+- no row was rejected and every game was written,
+- no game was added, and every exported column, price_cents, size_mb and the
+  genre links are unchanged (only version/updated_at move on; CSV can't tell
+  an empty string from NULL, so those count as equal).
+
+Usage (from the repository root):
+    python benchmarks/catalogue_roundtrip.py
+    python benchmarks/catalogue_roundtrip.py --db benchmarks/data/<generated>.db
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def snapshot(db, Game, game_genre):
+    """Every game's exported columns, typed columns and genre ids, by id."""
+    import catalogue_io
+
+    columns = [getattr(Game, name) for name in catalogue_io.FIELDS] + [Game.price_cents, Game.size_mb]
+    games = {row.id: tuple(None if value == "" else value for value in row)
+             for row in db.session.execute(db.select(*columns))}
+    genres = {}
+    for game_id, genre_id in db.session.execute(db.select(game_genre.c.game_id, game_genre.c.genre_id)):
+        genres.setdefault(game_id, set()).add(genre_id)
+    return {game_id: (row, genres.get(game_id, set())) for game_id, row in games.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join(ROOT, "app.db"), help="database to export (left untouched)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "roundtrip.db")
+        shutil.copy(args.db, path)
+        os.environ["DATABASE_URL"] = "sqlite:///" + path
+        from app import create_app
+        from models import db, Game, game_genre
+        import catalogue_io
+        import migrations
+
+        failures = []
+        with create_app().app_context():
+            migrations.upgrade_database()
+            before = snapshot(db, Game, game_genre)
+            for fmt in catalogue_io.FORMATS:
+                stream = io.StringIO()
+                exported = catalogue_io.export_games(stream, fmt, echo=lambda message: None)
+                stream.seek(0)
+                written, rejected = catalogue_io.import_games(stream, fmt, echo=print)
+                after = snapshot(db, Game, game_genre)
+                changed = [game_id for game_id in before if after.get(game_id) != before[game_id]]
+                print(f"{fmt}: exported {exported:,}, written {written:,}, rejected {rejected:,}, "
+                      f"added {len(after) - len(before):,}, changed {len(changed):,}")
+                if rejected or written != exported or len(after) != len(before) or changed:
+                    failures.append(fmt)
+                    for game_id in changed[:10]:
+                        print(f"  game {game_id}: {before[game_id]} -> {after.get(game_id)}")
+
+    if failures:
+        raise SystemExit(f"FAILED: {', '.join(failures)} round trip changed the catalogue")
+    print("OK: export then import leaves the catalogue unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Concurrency stress check for checkout().
+
+Fires many checkouts for the same user at once (like several open tabs or WSGI workers),
+with carts that overlap on purpose, against a throwaway SQLite database. Then checks:
+- no request failed (no duplicate-key or other errors),
+- no duplicate rows in 'purchases' and no lost purchases (every carted game is owned),
+- the "newly purchased" counts add up to exactly what ended up in the table.
+
+Usage (from the repository root):
+    python benchmarks/checkout_stress.py --workers 4 --threads 8 --rounds 25
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def setup_database(path, game_count):
+    """Create the schema plus one user and game_count games."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    from app import create_app
+    from models import db, User, Game
+    import migrations
+
+    app = create_app()
+    with app.app_context():
+        migrations.upgrade_database()
+        user = User(email="stress@example.com")
+        user.password_hash = "unused"
+        db.session.add(user)
+        for i in range(game_count):
+            game = Game(title=f"Game {i}", price="$9.99", size="1 GB", genre="Action")
+            game.sync_typed_fields()
+            db.session.add(game)
+        db.session.commit()
+        return user.id
+
+def run_worker(path, user_id, game_count, threads, rounds, seed):
+    """Run 'threads' concurrent clients in this process; returns (newly_purchased_total, errors, carted_ids)."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    from app import create_app
+
+    app = create_app()
+    totals = {"new": 0, "errors": 0}
+    carted = set()
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def client_loop(thread_no):
+        rng = random.Random(seed * 1000 + thread_no)
+        client = app.test_client()
+        start.wait()
+        for _ in range(rounds):
+            cart = rng.sample(range(1, game_count + 1), k=rng.randint(1, 8))
+            with client.session_transaction() as sess:
+                sess["_user_id"] = str(user_id)
+                sess["_fresh"] = True
+            client.post("/cart/add", data={"game_ids": cart})
+            response = client.post("/checkout")
+            with client.session_transaction() as sess:
+                flashes = sess.get("_flashes", [])
+                sess.pop("_flashes", None)
+            with lock:
+                carted.update(cart)
+                if response.status_code != 302:
+                    totals["errors"] += 1
+                    continue
+                for _category, message in flashes:
+                    if message.startswith("Purchase successful!"):
+                        totals["new"] += int(message.split()[2])
+
+    workers = [threading.Thread(target=client_loop, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return totals["new"], totals["errors"], carted
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="processes (like WSGI workers)")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients per process")
+    parser.add_argument("--rounds", type=int, default=25, help="checkouts per client")
+    parser.add_argument("--games", type=int, default=1000, help="games in the catalogue")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        user_id = setup_database(path, args.games)
+
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [
+                pool.submit(run_worker, path, user_id, args.games, args.threads, args.rounds, seed)
+                for seed in range(args.workers)
+            ]
+            results = [f.result() for f in futures]
+
+        newly_purchased = sum(r[0] for r in results)
+        errors = sum(r[1] for r in results)
+        carted = set().union(*(r[2] for r in results))
+        db = sqlite3.connect(path)
+        rows, distinct = db.execute(
+            "SELECT count(*), count(DISTINCT game_id) FROM purchases WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        db.close()
+
+    total = args.workers * args.threads * args.rounds
+    print(f"checkouts:          {total}")
+    print(f"failed requests:    {errors}")
+    print(f"purchase rows:      {rows} ({distinct} distinct games)")
+    print(f"reported as new:    {newly_purchased}")
+    print(f"games ever carted:  {len(carted)}")
+
+    ok = errors == 0 and rows == distinct == newly_purchased == len(carted)
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Read throughput while other processes check out, with the default and the production config.
+
+Starts reader processes (game details pages and catalogue filter requests) and writer
+processes (checkouts of random carts for random users) against a copy of a generated
+database, all at the same time, like WSGI workers sharing one SQLite file. Runs once per
+config and prints reads/s, read latency percentiles, checkouts/s and failed requests side by side.
+
+With the default rollback journal a checkout locks readers out while it commits;
+with ProductionConfig (WAL + PRAGMAs) readers keep going.
+
+Usage (from the repository root):
+    python benchmarks/concurrency.py --scale 1k --readers 4 --writers 2 --seconds 10
+    python benchmarks/concurrency.py --configs config.ProductionConfig
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+from run import percentile
+
+AJAX = {"X-Requested-With": "XMLHttpRequest"}
+DEFAULT_CONFIGS = ["config.Config", "config.ProductionConfig"]
+
+
+def login_as(client, user_id):
+    """Log a test client in without going through the (slow, on purpose) password check."""
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+def run_process(role, number, db_path, config, games, users, seconds, ready, start):
+    """One worker process: reads or checks out until the time is up. Returns its timings."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+    from app import create_app
+
+    app = create_app(config)
+    client = app.test_client()
+    rng = random.Random(number * 31 + (role == "writer"))
+    login_as(client, 2 + rng.randrange(users - 1))
+    timings, errors = [], 0
+
+    ready.put(number)
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        if role == "reader":
+            if rng.random() < 0.5:
+                response = client.get(f"/game/{rng.randint(1, games)}")
+            else:
+                query = f"title={rng.choice(datagen.WORDS)}&max_price={rng.randint(5, 70)}"
+                response = client.get("/catalogue?" + query, headers=AJAX)
+            ok = response.status_code == 200
+        else:
+            login_as(client, 2 + rng.randrange(users - 1))
+            client.post("/cart/add", data={"game_ids": rng.sample(range(1, games + 1), k=rng.randint(1, 5))})
+            response = client.post("/checkout")
+            ok = response.status_code == 302
+        timings.append(time.perf_counter() - started)
+        errors += not ok
+    return role, timings, errors
+
+def upgrade(db_path, config):
+    """Bring a (possibly older) generated database up to the current schema."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+    from app import create_app
+    from models import db
+    import migrations
+
+    app = create_app(config)
+    with app.app_context():
+        migrations.upgrade_database()
+        db.engine.dispose()
+
+def run_config(config, source_db, db_path, args, games, users):
+    """Run every reader and writer at once against a fresh copy of the database at 'db_path'."""
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    shutil.copy(source_db, db_path)
+    upgrade(db_path, config)
+
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    ready, start = manager.Queue(), manager.Event()
+    roles = ["reader"] * args.readers + ["writer"] * args.writers
+    with context.Pool(len(roles)) as pool:
+        pending = [
+            pool.apply_async(run_process, (role, n, db_path, config, games, users, args.seconds, ready, start))
+            for n, role in enumerate(roles)
+        ]
+        # Start the clock only once every process has its app built
+        for _ in roles:
+            ready.get()
+        start.set()
+        results = [p.get() for p in pending]
+    manager.shutdown()
+
+    summary = {}
+    for role in ("reader", "writer"):
+        timings = sorted(t for r, values, _ in results if r == role for t in values)
+        summary[role] = {
+            "requests": len(timings),
+            "errors": sum(e for r, _, e in results if r == role),
+            "per_second": len(timings) / args.seconds,
+            "p50_ms": 1000 * percentile(timings, 0.50),
+            "p95_ms": 1000 * percentile(timings, 0.95),
+            "p99_ms": 1000 * percentile(timings, 0.99),
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=datagen.SCALES, default="1k", help="generated dataset to use")
+    parser.add_argument("--readers", type=int, default=4, help="reader processes")
+    parser.add_argument("--writers", type=int, default=2, help="checkout processes")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each run")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="config classes to compare")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    source_db = datagen.database_for(args.scale, args.seed)
+    games, users, _purchases = datagen.SCALES[args.scale]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Same path for every run: the app reads DATABASE_URL once, when config.py is imported
+        db_path = os.path.join(tmp, "concurrency.db")
+        results = {config: run_config(config, source_db, db_path, args, games, users) for config in args.configs}
+
+    print(f"\n{args.readers} readers + {args.writers} writers for {args.seconds:g}s on the {args.scale} dataset\n")
+    print(f"{'config':<26}{'reads/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'read err':>10}"
+          f"{'checkouts/s':>13}{'p95 ms':>9}{'co err':>8}")
+    for config, summary in results.items():
+        r, w = summary["reader"], summary["writer"]
+        print(f"{config:<26}{r['per_second']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['errors']:>10}{w['per_second']:>13.1f}{w['p95_ms']:>9.2f}{w['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
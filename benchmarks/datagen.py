@@ -0,0 +1,188 @@
+"""
+Synthetic database generator for the benchmarks.
+
+Builds an SQLite database with the app's schema and a realistic-looking catalogue:
+- prices: mostly common price points, about a fifth free-to-play,
+- sizes: log-normal, from a few MB up to ~150 GB,
+- genres: 1-4 per game, popular genres more likely,
+- users with purchase histories skewed towards popular games.
+
+Every synthetic user's password is "benchmark".
+
+Usage (from the repository root):
+    python benchmarks/datagen.py --scale 100k
+    python benchmarks/datagen.py --games 5000 --users 500 --out /tmp/bench.db
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Preset sizes: games, users, average purchases per user
+SCALES = {
+    "1k": (1_000, 200, 10),
+    "100k": (100_000, 10_000, 25),
+    "1m": (1_000_000, 50_000, 40),
+}
+
+PASSWORD = "benchmark"
+
+GENRES = [
+    ("Action", 30), ("Adventure", 20), ("Indie", 25), ("RPG", 12), ("Strategy", 10),
+    ("Simulation", 10), ("Casual", 12), ("Free To Play", 8), ("Massively Multiplayer", 4),
+    ("Sports", 4), ("Racing", 3), ("Early Access", 5),
+]
+PRICE_POINTS = [
+    ("Free", 20), ("$4.99", 8), ("$9.99", 15), ("$14.99", 12), ("$19.99", 14),
+    ("$24.99", 8), ("$29.99", 9), ("$39.99", 6), ("$49.99", 4), ("$59.99", 3), ("$69.99", 1),
+]
+WORDS = (
+    "shadow star iron legend dark empire last dragon void crystal forge night quest "
+    "rogue kingdom space storm lost frontier zero blade hollow echo wild sky titan rift "
+    "ember frost nova ancient tactics racer tycoon survivor hunter dungeon galaxy"
+).split()
+STUDIOS = [f"{w.title()} {s}" for w in WORDS[:20] for s in ("Games", "Studios", "Interactive")]
+
+
+def weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights)[0]
+
+def fake_size(rng):
+    """Log-normal size around ~10 GB, written the way the real catalogue writes it."""
+    mb = int(min(max(math.exp(rng.gauss(9.2, 1.4)), 20), 150 * 1024))
+    return f"{mb} MB" if mb < 1024 else f"{round(mb / 1024)} GB"
+
+def fake_game(rng, n):
+    title = " ".join(w.title() for w in rng.sample(WORDS, rng.randint(1, 3)))
+    if rng.random() < 0.3:
+        title += f" {rng.randint(2, 5)}"
+    genres = []
+    for _ in range(rng.randint(1, 4)):
+        genre = weighted(rng, GENRES)
+        if genre not in genres:
+            genres.append(genre)
+    description = " ".join(rng.choices(WORDS, k=rng.randint(20, 60))).capitalize() + "."
+    developer = rng.choice(STUDIOS)
+    publisher = developer if rng.random() < 0.5 else rng.choice(STUDIOS)
+    return {
+        "title": f"{title} #{n}",
+        "description": description,
+        "developer": developer,
+        "publisher": publisher,
+        "price": weighted(rng, PRICE_POINTS),
+        "genres": genres,
+        "size": fake_size(rng),
+    }
+
+def generate(path, games, users, purchases_per_user, seed=1, batch=10_000, quiet=False):
+    """Create a fresh database at 'path' with the requested amount of synthetic data."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    from app import create_app
+    from models import db
+    from utils import price_to_cents, size_to_mb
+    from werkzeug.security import generate_password_hash
+    import migrations
+
+    app = create_app()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    log = (lambda *a: None) if quiet else (lambda *a: print(*a, flush=True))
+
+    # Tables first, data next, then the one-pass parts of the upgrade (indexes, full-text search)
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    genre_ids = {}
+    for name, _weight in GENRES:
+        genre_ids[name] = conn.execute("INSERT INTO genre (name) VALUES (?)", (name,)).lastrowid
+
+    for start in range(0, games, batch):
+        rows, links = [], []
+        for n in range(start + 1, min(start + batch, games) + 1):
+            g = fake_game(rng, n)
+            rows.append((n, g["title"], g["description"], g["developer"], g["publisher"], g["price"],
+                         ", ".join(g["genres"]), g["size"], None, price_to_cents(g["price"]), size_to_mb(g["size"])))
+            links.extend((n, genre_ids[name]) for name in g["genres"])
+        conn.executemany(
+            "INSERT INTO game (id, title, description, developer, publisher, price, genre, size, "
+            "video_link, price_cents, size_mb) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO game_genre (game_id, genre_id) VALUES (?, ?)", links)
+        log(f"  games: {min(start + batch, games):>9,}/{games:,}")
+
+    # One hash for everyone; hashing per user would dominate the run time
+    password_hash = generate_password_hash(PASSWORD)
+    conn.execute("INSERT INTO user (id, email, password_hash, is_admin) VALUES (1, 'admin@example.com', ?, 1)",
+                 (password_hash,))
+    conn.executemany(
+        "INSERT INTO user (id, email, password_hash, is_admin) VALUES (?, ?, ?, 0)",
+        ((n, f"user{n}@example.com", password_hash) for n in range(2, users + 1)),
+    )
+
+    # Popularity follows a power law: low ids are the "hits"
+    def popular_game():
+        return min(int(games * rng.random() ** 3) + 1, games)
+
+    for start in range(2, users + 1, batch):
+        rows = []
+        for user_id in range(start, min(start + batch, users + 1)):
+            owned = {popular_game() for _ in range(int(rng.expovariate(1 / purchases_per_user)))}
+            rows.extend((user_id, game_id) for game_id in owned)
+        conn.executemany("INSERT INTO purchases (user_id, game_id) VALUES (?, ?)", rows)
+    log(f"  users: {users:,}")
+    conn.commit()
+    conn.close()
+
+    with app.app_context():
+        migrations.upgrade_database()
+        db.engine.dispose()
+    log(f"Generated {path} in {time.perf_counter() - started:.1f}s")
+    return path
+
+def database_for(scale, seed=1):
+    """Path of the generated database for a preset scale, generating it if it doesn't exist yet."""
+    games, users, purchases_per_user = SCALES[scale]
+    path = os.path.join(DATA_DIR, f"bench-{scale}-seed{seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        generate(path, games, users, purchases_per_user, seed)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, help="preset size (games/users/purchases)")
+    parser.add_argument("--games", type=int, help="number of games (overrides --scale)")
+    parser.add_argument("--users", type=int, help="number of users (overrides --scale)")
+    parser.add_argument("--purchases", type=int, help="average purchases per user (overrides --scale)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="output path (default: benchmarks/data/bench-<scale>-seed<seed>.db)")
+    args = parser.parse_args()
+
+    games, users, purchases_per_user = SCALES[args.scale or "1k"]
+    games = args.games or games
+    users = args.users or users
+    purchases_per_user = args.purchases or purchases_per_user
+    out = args.out
+    if not out:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        out = os.path.join(DATA_DIR, f"bench-{args.scale or games}-seed{args.seed}.db")
+    generate(out, games, users, purchases_per_user, args.seed)
+
+
+if __name__ == "__main__":
+    main()
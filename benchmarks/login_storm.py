@@ -0,0 +1,153 @@
+"""
+Login throughput and catalogue tail latency during a login storm.
+
+Runs threads that log in over and over (each login is one scrypt check) next to threads
+that browse the catalogue (AJAX filter requests), in one process like a WSGI worker.
+Repeats that for several PASSWORD_HASH_WORKERS settings and prints, side by side:
+logins/s, logins turned away with 503, login p95 and catalogue p50/p95/p99.
+
+With PASSWORD_HASH_WORKERS=0 every login hashes in its own request thread, so a storm
+takes all the CPU; with a small pool only that many hashes run at once and the catalogue
+keeps its latency, at the price of some logins getting a quick 503.
+
+Usage (from the repository root):
+    python benchmarks/login_storm.py --scale 1k --logins 16 --readers 2 --seconds 10
+    python benchmarks/login_storm.py --workers 0 1 2
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+from run import percentile
+
+AJAX = {"X-Requested-With": "XMLHttpRequest"}
+
+
+def run_storm(app, workers, args, users):
+    """One run with PASSWORD_HASH_WORKERS=workers; returns the summary dict."""
+    from passwords import password_hasher
+
+    app.config["PASSWORD_HASH_WORKERS"] = workers
+    password_hasher.init_app(app)
+
+    lock = threading.Lock()
+    logins, rejected, failed, reads = [], 0, 0, []
+    deadline = [0.0]
+    # The clock starts once every thread is ready
+    start = threading.Barrier(
+        args.logins + args.readers, action=lambda: deadline.__setitem__(0, time.perf_counter() + args.seconds)
+    )
+
+    def login_loop(number):
+        nonlocal rejected, failed
+        rng = random.Random(number)
+        client = app.test_client()
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            email = f"user{2 + rng.randrange(users - 1)}@example.com"
+            started = time.perf_counter()
+            response = client.post("/login", data={"email": email, "password": datagen.PASSWORD})
+            elapsed = time.perf_counter() - started
+            client.get("/logout")
+            with lock:
+                if response.status_code == 302:
+                    logins.append(elapsed)
+                elif response.status_code == 503:
+                    rejected += 1
+                else:
+                    failed += 1
+            if response.status_code == 503:
+                # Back off like a browser user (or a polite client) would
+                time.sleep(float(response.headers.get("Retry-After", 1)))
+
+    def read_loop(number):
+        rng = random.Random(1000 + number)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(2 + rng.randrange(users - 1))
+            sess["_fresh"] = True
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            # Random filters, so most requests miss the fragment cache and run the query
+            query = f"title={rng.choice(datagen.WORDS)}&max_price={rng.randint(5, 70)}&sort=price"
+            started = time.perf_counter()
+            client.get("/catalogue?" + query, headers=AJAX)
+            elapsed = time.perf_counter() - started
+            with lock:
+                reads.append(elapsed)
+
+    threads = [threading.Thread(target=login_loop, args=(n,)) for n in range(args.logins)]
+    threads += [threading.Thread(target=read_loop, args=(n,)) for n in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    logins.sort()
+    reads.sort()
+    return {
+        "logins_per_second": len(logins) / args.seconds,
+        "rejected": rejected,
+        "failed": failed,
+        "login_p95_ms": 1000 * percentile(logins, 0.95),
+        "reads_per_second": len(reads) / args.seconds,
+        "read_p50_ms": 1000 * percentile(reads, 0.50),
+        "read_p95_ms": 1000 * percentile(reads, 0.95),
+        "read_p99_ms": 1000 * percentile(reads, 0.99),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=datagen.SCALES, default="1k", help="generated dataset to use")
+    parser.add_argument("--logins", type=int, default=16, help="threads logging in")
+    parser.add_argument("--readers", type=int, default=2, help="threads browsing the catalogue")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2],
+                        help="PASSWORD_HASH_WORKERS settings to compare (0 = hash in the request thread)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    source_db = datagen.database_for(args.scale, args.seed)
+    _games, users, _purchases = datagen.SCALES[args.scale]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A copy, since logins may upgrade old password hashes
+        db_path = os.path.join(tmp, "login_storm.db")
+        shutil.copy(source_db, db_path)
+        os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+        from app import create_app
+        from models import db
+        import migrations
+
+        app = create_app()
+        app.config["WTF_CSRF_ENABLED"] = False
+        with app.app_context():
+            migrations.upgrade_database()
+        results = {workers: run_storm(app, workers, args, users) for workers in args.workers}
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f"\n{args.logins} login threads + {args.readers} catalogue threads for {args.seconds:g}s "
+          f"on the {args.scale} dataset\n")
+    print(f"{'hash workers':<14}{'logins/s':>10}{'503s':>7}{'p95 ms':>9}"
+          f"{'reads/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for workers, r in results.items():
+        label = "inline" if workers == 0 else str(workers)
+        print(f"{label:<14}{r['logins_per_second']:>10.1f}{r['rejected']:>7}{r['login_p95_ms']:>9.1f}"
+              f"{r['reads_per_second']:>10.1f}{r['read_p50_ms']:>9.2f}{r['read_p95_ms']:>9.2f}{r['read_p99_ms']:>9.2f}")
+        if r["failed"]:
+            print(f"{'':<14}{r['failed']} logins failed")
+
+
+if __name__ == "__main__":
+    main()
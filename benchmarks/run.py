@@ -0,0 +1,261 @@
+"""
+Load test / benchmark for the main user flows.
+
+Each simulated client logs in, drags the catalogue filters (a burst of AJAX requests like
+the price/size sliders and the search box produce), scrolls a page, adds games to the cart,
+checks out and opens the inventory. Clients run concurrently in threads, either against the
+Flask test client (default) or a running server (--url).
+
+Reports throughput and p50/p95/p99 latency per step and saves everything as JSON in
+benchmarks/results/ so runs can be compared over time (--compare).
+
+Usage (from the repository root):
+    python benchmarks/run.py --scale 1k --clients 8 --iterations 5
+    python benchmarks/run.py --db /tmp/bench.db --url http://127.0.0.1:8000
+    python benchmarks/run.py --scale 100k --compare benchmarks/results/<earlier run>.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+AJAX = {"X-Requested-With": "XMLHttpRequest"}
+
+
+class TestClientTransport:
+    """Drives the app in-process through Flask's test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path, headers=None):
+        response = self.client.get(path, headers=headers or {})
+        return response.status_code, response.get_data()
+
+    def post(self, path, data=None):
+        response = self.client.post(path, data=data or {})
+        return response.status_code, response.get_data()
+
+
+class HttpTransport:
+    """Drives a running server over HTTP (keeps cookies, fills in the CSRF token for forms)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        cookies = http.cookiejar.CookieJar()
+        # Don't follow redirects: we time each request on its own, like the test client
+        no_redirect = type("NoRedirect", (urllib.request.HTTPRedirectHandler,), {
+            "redirect_request": lambda *args, **kwargs: None,
+        })
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies), no_redirect)
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def get(self, path, headers=None):
+        return self._open(urllib.request.Request(self.base_url + path, headers=headers or {}))
+
+    def post(self, path, data=None):
+        data = dict(data or {})
+        if path == "/login":
+            # Flask-WTF forms need the CSRF token from the form page
+            _status, page = self.get(path)
+            match = re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"', page)
+            if match:
+                data["csrf_token"] = match.group(1).decode()
+        body = urllib.parse.urlencode(data, doseq=True).encode()
+        return self._open(urllib.request.Request(self.base_url + path, data=body, method="POST"))
+
+
+def catalogue_burst(rng, genres):
+    """Query strings like the ones a user generates while dragging sliders and typing a search."""
+    queries = []
+    genre = rng.choice(genres)
+    max_price = 70
+    for _ in range(6):
+        max_price = max(0, max_price - rng.randint(3, 12))
+        queries.append({"min_price": 0, "max_price": max_price, "genres": genre})
+    term = rng.choice(datagen.WORDS)
+    for end in range(2, len(term) + 1):
+        queries.append({"title": term[:end], "max_price": max_price})
+    return [urllib.parse.urlencode(q, doseq=True) for q in queries]
+
+def run_client(make_transport, client_no, users, iterations, seed, timings, errors, lock):
+    rng = random.Random(seed * 7919 + client_no)
+    transport = make_transport()
+    genres = [name for name, _weight in datagen.GENRES]
+
+    def timed(step, method, *args, expect=(200, 302, 304)):
+        started = time.perf_counter()
+        status, body = getattr(transport, method)(*args)
+        elapsed = time.perf_counter() - started
+        with lock:
+            timings.setdefault(step, []).append(elapsed)
+            if status not in expect:
+                errors[step] = errors.get(step, 0) + 1
+        return body
+
+    user_id = 2 + (client_no % max(users - 1, 1))
+    timed("login", "post", "/login", {"email": f"user{user_id}@example.com", "password": datagen.PASSWORD})
+
+    for _ in range(iterations):
+        for query in catalogue_burst(rng, genres):
+            timed("catalogue_filter", "get", "/catalogue?" + query, AJAX)
+        page = timed("catalogue_page", "get", "/catalogue")
+        match = re.search(rb'data-next-page>\s*<a href="([^"]+)"', page)
+        if match:
+            timed("catalogue_next_page", "get", match.group(1).decode().replace("&amp;", "&"), AJAX)
+
+        ids = [int(i) for i in re.findall(rb"/add_to_cart/(\d+)", page)]
+        for game_id in rng.sample(ids, min(3, len(ids))):
+            timed("add_to_cart", "post", f"/add_to_cart/{game_id}")
+        timed("checkout", "post", "/checkout")
+        timed("inventory", "get", "/inventory")
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def summarize(timings, errors, wall_seconds):
+    steps = {}
+    for step, values in sorted(timings.items()):
+        values = sorted(values)
+        steps[step] = {
+            "requests": len(values),
+            "errors": errors.get(step, 0),
+            "throughput_rps": len(values) / wall_seconds,
+            "mean_ms": 1000 * sum(values) / len(values),
+            "p50_ms": 1000 * percentile(values, 0.50),
+            "p95_ms": 1000 * percentile(values, 0.95),
+            "p99_ms": 1000 * percentile(values, 0.99),
+        }
+    total = sum(len(v) for v in timings.values())
+    return {
+        "total_requests": total,
+        "total_errors": sum(errors.values()),
+        "wall_seconds": wall_seconds,
+        "throughput_rps": total / wall_seconds,
+        "steps": steps,
+    }
+
+def print_report(summary, baseline=None):
+    header = f"{'step':<22}{'reqs':>7}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"{'p50 vs base':>13}{'p95 vs base':>13}"
+    print(header)
+    for step, s in summary["steps"].items():
+        line = (f"{step:<22}{s['requests']:>7}{s['errors']:>5}{s['throughput_rps']:>9.1f}"
+                f"{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
+        base = (baseline or {}).get("steps", {}).get(step)
+        if base:
+            for key in ("p50_ms", "p95_ms"):
+                change = (s[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+                line += f"{change:>+12.1f}%"
+        print(line)
+    print(f"\n{summary['total_requests']} requests, {summary['total_errors']} errors, "
+          f"{summary['throughput_rps']:.1f} req/s overall in {summary['wall_seconds']:.1f}s")
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=datagen.SCALES, default="1k", help="generated dataset to use")
+    parser.add_argument("--db", help="use this database instead of a generated one")
+    parser.add_argument("--users", type=int, help="number of users in --db (default: from --scale)")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process test client")
+    parser.add_argument("--config", default="config.Config",
+                        help="config class for the in-process app, e.g. config.ProductionConfig")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=5, help="flow repetitions per client")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="free-form note stored with the results")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--no-save", action="store_true", help="don't write a results file")
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db) if args.db else datagen.database_for(args.scale, args.seed)
+    users = args.users or datagen.SCALES[args.scale][1]
+    if args.url:
+        make_transport = lambda: HttpTransport(args.url)
+    else:
+        os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+        from app import create_app
+        import migrations
+        app = create_app(args.config)
+        app.config["WTF_CSRF_ENABLED"] = False
+        with app.app_context():
+            migrations.upgrade_database()  # Generated databases may predate the current schema
+        make_transport = lambda: TestClientTransport(app)
+
+    timings, errors, lock = {}, {}, threading.Lock()
+    threads = [
+        threading.Thread(target=run_client,
+                         args=(make_transport, n, users, args.iterations, args.seed, timings, errors, lock))
+        for n in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    summary = summarize(timings, errors, time.perf_counter() - started)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["summary"]
+    print_report(summary, baseline)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{stamp}-{args.scale if not args.db else 'custom'}.json")
+        with open(out, "w") as f:
+            json.dump({
+                "label": args.label,
+                "timestamp": stamp,
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "target": args.url or "test-client",
+                "config": None if args.url else args.config,
+                "database": db_path,
+                "scale": None if args.db else args.scale,
+                "clients": args.clients,
+                "iterations": args.iterations,
+                "seed": args.seed,
+                "summary": summary,
+            }, f, indent=2)
+        print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Cold start: how long a fresh worker process takes to import the app and answer its first requests.
+
+Every run starts a new Python process (like a new WSGI worker), which times
+'import app', create_app(), the optional warm-up, and then the first and second
+response of a few pages (login, dashboard, catalogue, game details, inventory).
+Three setups are compared, each the median of --runs processes:
+
+    cold      empty template bytecode cache, no warm-up (a brand new machine)
+    cached    template bytecode cache filled by an earlier process, no warm-up
+    warm-up   cached, plus warmup.warm_up() at boot (what gunicorn.conf.py does)
+
+Usage (from the repository root):
+    python benchmarks/startup.py --scale 1k --runs 5
+    python benchmarks/startup.py --scale 100k --runs 3
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+MODES = ("cold", "cached", "warm-up")
+
+# Pages timed in each process, in order (the game id is filled in)
+PAGES = ("/login", "/dashboard", "/catalogue", "/game/{game_id}", "/inventory")
+
+
+def child(warm):
+    """Runs in the fresh process: time each start-up stage, print the timings as JSON."""
+    timings = {}
+    started = time.perf_counter()
+    import app as app_module
+    timings["import"] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    app = app_module.create_app()
+    timings["create_app"] = time.perf_counter() - mark
+
+    if warm:
+        import warmup
+        mark = time.perf_counter()
+        warmup.warm_up(app)
+        timings["warm_up"] = time.perf_counter() - mark
+
+    anonymous = app.test_client()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "2"
+        sess["_fresh"] = True
+    for page in PAGES:
+        path = page.format(game_id=1)
+        user = anonymous if page == "/login" else client
+        for attempt in ("first", "second"):
+            mark = time.perf_counter()
+            response = user.get(path)
+            timings[f"{page} {attempt}"] = time.perf_counter() - mark
+            if response.status_code != 200:
+                raise SystemExit(f"{path} returned {response.status_code}")
+        if page == "/catalogue":
+            timings["boot to catalogue"] = time.perf_counter() - started - timings["/catalogue second"]
+    print(json.dumps(timings))
+
+def run_process(db_path, cache_dir, warm):
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + db_path, TEMPLATE_CACHE_DIR=cache_dir)
+    command = [sys.executable, os.path.abspath(__file__), "--child"] + (["--warm"] if warm else [])
+    started = time.perf_counter()
+    output = subprocess.run(command, env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process (wall)"] = time.perf_counter() - started
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=datagen.SCALES, default="1k", help="generated dataset to use")
+    parser.add_argument("--runs", type=int, default=5, help="processes per setup (the median is shown)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.warm)
+        return
+
+    source_db = datagen.database_for(args.scale, args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        shutil.copy(source_db, db_path)
+        # Bring the copy up to date once, so no run pays for the migration
+        os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+        from app import create_app
+        import migrations
+        with create_app().app_context():
+            migrations.upgrade_database()
+
+        cache_dir = os.path.join(tmp, "templates")
+        for mode in MODES:
+            runs = []
+            for _ in range(args.runs):
+                if mode == "cold":
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                runs.append(run_process(db_path, cache_dir, warm=mode == "warm-up"))
+            results[mode] = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+
+    names = list(dict.fromkeys(name for timings in results.values() for name in timings))
+    print(f"\nStart-up of a fresh process on the {args.scale} dataset, median of {args.runs} runs (ms)\n")
+    print(f"{'':<22}" + "".join(f"{mode:>10}" for mode in MODES))
+    for name in names:
+        print(f"{name:<22}" + "".join(
+            f"{1000 * results[mode][name]:>10.1f}" if name in results[mode] else f"{'-':>10}" for mode in MODES
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+# Small process-local caches shared by the routes
+import hashlib
+import itertools
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, User, purchases, cache_generation, cart_game_ids
+
+
+class LRUCache:
+    """
+    Thread-safe dict that forgets the least recently used entries.
+    - Holds at most 'max_entries' items, and at most 'max_bytes' of values if given
+      (measured with 'sizeof', len() by default).
+    - Counts hits and misses so the caches can be monitored.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if self.max_bytes is not None:
+                if key in self._data:
+                    self._bytes -= self._sizeof(self._data[key])
+                self._bytes += self._sizeof(value)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1
+            ):
+                self._forget(self._data.popitem(last=False)[1])
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data.pop(key)
+            self._forget(value)
+            return value
+
+    def pop_matching(self, predicate):
+        """Forget every entry whose key satisfies predicate(key) (a scan: for rare events only)."""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                self._forget(self._data.pop(key))
+
+    def _forget(self, value):
+        if self.max_bytes is not None:
+            self._bytes -= self._sizeof(value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Hit/miss counters and current size, for the metrics page."""
+        stats = {"hits": self.hits, "misses": self.misses, "entries": len(self._data)}
+        if self.max_bytes is not None:
+            stats["bytes"] = self._bytes
+        return stats
+
+
+class OwnedGames:
+    """
+    The ids of the games one user owns, as a compact sorted int array.
+    - 'in' is a binary search.
+    - 'version' is unique per load, so it can be part of other cache keys.
+    """
+
+    __slots__ = ("ids", "version")
+
+    def __init__(self, ids, version):
+        self.ids = array("q", sorted(ids))
+        self.version = version
+
+    def __contains__(self, game_id):
+        pos = bisect_left(self.ids, game_id)
+        return pos < len(self.ids) and self.ids[pos] == game_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def as_json(self):
+        """The ids as a JSON array, e.g. for SQLite's json_each()."""
+        return "[" + ",".join(map(str, self.ids)) + "]"
+
+
+class PerUserCache:
+    """
+    Something loaded per user from the database and kept (LRU) until it changes.
+    - Subclasses implement load(user_id).
+    - Call invalidate(user_id) after that user's data changed,
+      and invalidate_all() after a change that affects everyone.
+    """
+
+    def __init__(self, max_users=10000):
+        self._entries = LRUCache(max_users)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a load that raced with one isn't cached
+        self._epoch = 0
+
+    def load(self, user_id):
+        raise NotImplementedError
+
+    def get(self, user_id):
+        """Return the cached value for a user, loading it if needed."""
+        value = self._entries.get(user_id)
+        if value is not None:
+            return value
+
+        epoch = self._epoch
+        value = self.load(user_id)
+        with self._lock:
+            if epoch == self._epoch:
+                self._entries.set(user_id, value)
+        return value
+
+    def invalidate(self, user_id):
+        """Forget one user's entry."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(user_id)
+
+    def invalidate_all(self):
+        """Forget every user's entry."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+
+class OwnedGamesCache(PerUserCache):
+    """
+    Per-user owned game ids so the catalogue and inventory don't join through 'purchases' every time.
+    - Call invalidate(user_id) after a checkout or user deletion,
+      and invalidate_all() after a game is deleted.
+    """
+
+    def __init__(self, max_users=10000):
+        super().__init__(max_users)
+        # Every load gets a new version number
+        self._versions = itertools.count(1)
+
+    def load(self, user_id):
+        ids = db.session.scalars(
+            db.select(purchases.c.game_id).where(purchases.c.user_id == user_id)
+        ).all()
+        return OwnedGames(ids, next(self._versions))
+
+
+class CartCache(PerUserCache):
+    """
+    Per-user cart contents as a frozenset of game ids (constant-time 'in', cheap len() for the badge).
+    - Call invalidate(user_id) after the cart changes (add, remove, checkout),
+      and invalidate_all() after a game is deleted.
+    """
+
+    def load(self, user_id):
+        return frozenset(cart_game_ids(user_id))
+
+    def count(self, user_id):
+        """Number of games in the user's cart."""
+        return len(self.get(user_id))
+
+
+class UserSnapshot(UserMixin):
+    """
+    Read-only copy of the User columns most requests need (id, email, is_admin), used as current_user.
+    - 'record' loads the full User row, for the few routes that change it or check the password.
+    """
+
+    def __init__(self, id, email, is_admin, expires):
+        self.__dict__.update(id=id, email=email, is_admin=bool(is_admin), expires=expires)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"UserSnapshot is read-only, change current_user.record.{name} instead")
+
+    @property
+    def record(self):
+        # The session's identity map makes repeated calls within a request free
+        return db.session.get(User, self.id)
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.email}>"
+
+
+class UserCache(PerUserCache):
+    """
+    UserSnapshots for Flask-Login's user_loader, so an authenticated request doesn't need a query.
+    - Entries expire after 'ttl' seconds as a safety net.
+    - Call invalidate(user_id) after the user's row changed or was deleted.
+    """
+
+    def __init__(self, max_users=10000, ttl=60.0):
+        super().__init__(max_users)
+        self.ttl = ttl
+
+    def load(self, user_id):
+        row = db.session.execute(
+            db.select(User.id, User.email, User.is_admin).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        return UserSnapshot(row.id, row.email, row.is_admin, time.monotonic() + self.ttl)
+
+    def get(self, user_id):
+        """Return the UserSnapshot for a user (None if there is no such user)."""
+        snapshot = super().get(user_id)
+        if snapshot is not None and snapshot.expires < time.monotonic():
+            self._entries.pop(user_id)
+            snapshot = super().get(user_id)
+        return snapshot
+
+
+class FragmentCache:
+    """
+    Rendered HTML fragments (or other response bodies, str or bytes), each with a strong ETag (a hash of the body).
+    - Keys must include everything the fragment depends on (filters, data versions, ...),
+      so entries never need to be invalidated, old ones just age out of the LRU.
+    - Capped by entries and by total body size (keys are per user, so there can be many).
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=32 * 1024 * 1024):
+        self._entries = LRUCache(max_entries, max_bytes=max_bytes, sizeof=lambda entry: len(entry[0]))
+
+    def get_or_render(self, key, render):
+        """Return (body, etag) for 'key', calling render() only on a miss."""
+        cached = self._entries.get(key)
+        if cached is None:
+            body = render()
+            data = body.encode() if isinstance(body, str) else body
+            cached = (body, hashlib.sha1(data).hexdigest())
+            self._entries.set(key, cached)
+        return cached
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+
+class GameCardCache:
+    """
+    Rendered HTML of single game cards (templates/game_card.html), shared by every user and filter.
+    - Keyed by game id, Game.version, Game.updated_at and whether it's the inventory variant: an edit
+      or import moves the version on, so every process sees the change without invalidating anything.
+      updated_at tells a game added under a deleted game's id (ids are reused) from the deleted one.
+    - evict(game_id) drops a deleted game's cards; cards of old versions age out (LRU, capped by
+      entries and by total size).
+    """
+
+    def __init__(self, max_entries=20000, max_bytes=32 * 1024 * 1024):
+        self._entries = LRUCache(max_entries, max_bytes=max_bytes)
+
+    def get_or_render(self, game, is_inventory, render):
+        """Return the card HTML for this version of 'game', calling render() only on a miss."""
+        key = (game.id, game.version, game.updated_at, is_inventory)
+        html = self._entries.get(key)
+        if html is None:
+            html = render()
+            self._entries.set(key, html)
+        return html
+
+    def evict(self, game_id):
+        """Forget every card of one game (after it was deleted)."""
+        self._entries.pop_matching(lambda key: key[0] == game_id)
+
+    def clear(self):
+        """Forget every card (after a bulk change)."""
+        self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+
+class CacheSync:
+    """
+    Keeps the in-process caches of several worker processes in step.
+    - A write that makes cached data stale also calls bump(name), in the same transaction.
+    - Every process polls the 'cache_generation' table (at most once per 'interval' seconds,
+      before a request) and runs the handlers of the names bumped since its last look.
+    - Names are "<kind>" or "<kind>:<argument>", e.g. "catalogue" or "owned:42";
+      handlers are registered per kind with on() and get the argument (or None).
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._seen = None  # Highest generation this process has acted on
+        self._next_poll = 0.0
+
+    def on(self, kind, handler):
+        """Call handler(argument) when another process bumps '<kind>' or '<kind>:<argument>'."""
+        self._handlers[kind] = handler
+
+    def bump(self, name):
+        """Mark 'name' as changed (commit the session afterwards, together with the change itself)."""
+        next_generation = db.select(db.func.coalesce(db.func.max(cache_generation.c.generation), 0) + 1)
+        statement = sqlite_insert(cache_generation).values(name=name, generation=next_generation.scalar_subquery())
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[cache_generation.c.name],
+            set_={"generation": statement.excluded.generation},
+        ))
+
+    def poll(self):
+        """Run the handlers for everything bumped since the last poll (rate limited)."""
+        now = time.monotonic()
+        if now < self._next_poll or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_poll = now + self.interval
+            if self._seen is None:
+                # Caches start out empty, so only changes from here on matter
+                self._seen = db.session.scalar(db.select(db.func.max(cache_generation.c.generation))) or 0
+                return
+            changes = db.session.execute(
+                db.select(cache_generation.c.name, cache_generation.c.generation)
+                .where(cache_generation.c.generation > self._seen)
+                .order_by(cache_generation.c.generation)
+            ).all()
+            for name, generation in changes:
+                kind, _, argument = name.partition(":")
+                handler = self._handlers.get(kind)
+                if handler:
+                    handler(argument or None)
+                self._seen = generation
+        finally:
+            self._lock.release()
+
+
+# Shared instances used by the routes
+owned_games = OwnedGamesCache()
+carts = CartCache()
+user_snapshots = UserCache()
+catalogue_fragments = FragmentCache()
+game_cards = GameCardCache()
+# Rendered /game/<id> bodies, keyed by (game id, game version, updated_at, is_inventory, ...): an edit gives
+# a new key, so nothing needs invalidating and every process sees the change (a delete evicts the game)
+game_pages = LRUCache(max_entries=5000, max_bytes=16 * 1024 * 1024)
+cache_sync = CacheSync()
+
+# "owned:<user id>" after a checkout or user deletion, "owned" after a game deletion
+cache_sync.on("owned", lambda user_id: owned_games.invalidate(int(user_id)) if user_id else owned_games.invalidate_all())
+# "cart:<user id>" after any cart change, "cart" after a game deletion
+cache_sync.on("cart", lambda user_id: carts.invalidate(int(user_id)) if user_id else carts.invalidate_all())
+# "user:<user id>" after an account change, promotion or deletion
+cache_sync.on("user", lambda user_id: user_snapshots.invalidate(int(user_id)) if user_id else user_snapshots.invalidate_all())
+# "game:<game id>" after a game was deleted
+cache_sync.on("game", lambda game_id: evict_game(int(game_id)))
+
+def evict_game(game_id):
+    """Drop a deleted game's cards and pages (its id can be given to a new game)."""
+    game_cards.evict(game_id)
+    game_pages.pop_matching(lambda key: key[0] == game_id)
+
+def cache_stats():
+    """Hit/miss/size counters of every shared cache, by name."""
+    return {
+        "owned_games": owned_games.stats(),
+        "carts": carts.stats(),
+        "user_snapshots": user_snapshots.stats(),
+        "catalogue_fragments": catalogue_fragments.stats(),
+        "game_cards": game_cards.stats(),
+        "game_pages": game_pages.stats(),
+    }
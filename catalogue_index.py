@@ -0,0 +1,228 @@
+# Catalogue metadata cache and the SQL query behind the /catalogue filters
+import math
+import re
+import threading
+from collections import namedtuple
+
+from sqlalchemy import column, literal_column, table
+
+from caches import cache_sync
+from models import db, Game, Genre, game_genre
+
+# The FTS5 table created by migrations.create_search_index() (not part of the ORM metadata)
+game_fts = table("game_fts", column("rowid"))
+
+# bm25 column weights: title, description, developer, publisher
+SEARCH_WEIGHTS = (10.0, 1.0, 3.0, 3.0)
+
+# Sort orders the catalogue offers ("relevance" only applies while searching)
+SORT_ORDERS = ("relevance", "title", "price", "size")
+
+# What catalogue_query() returns: the filtered query plus how to order/paginate it
+CatalogueQuery = namedtuple("CatalogueQuery", ["query", "sort", "sort_columns"])
+
+# The filters of one catalogue request, as catalogue_query() keyword arguments
+CatalogueFilters = namedtuple(
+    "CatalogueFilters", ["title", "genres", "min_price", "max_price", "min_size", "max_size", "sort"]
+)
+
+
+class CatalogueIndex:
+    """
+    Process-wide cache of what the catalogue filter bar needs.
+    - The genre list and the slider min/max, read with index-only queries.
+    - Built lazily on first use and rebuilt after edit_game/delete_game invalidate it.
+    - 'version' changes every time the catalogue does (useful as a cache key).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.version = 0
+        self._reset()
+
+    def _reset(self):
+        self.genres = []
+        # Same defaults as before when the catalogue is empty
+        self.min_price_val = 0
+        self.max_price_val = 100
+        self.min_size_val = 0
+        self.max_size_val = 100
+
+    def ensure_loaded(self):
+        """Build the cache from the database the first time it's needed."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.rebuild()
+        return self
+
+    def rebuild(self):
+        """Reload the genre list and slider bounds from the database."""
+        # One scalar subquery per bound so SQLite can answer each from its index
+        bounds = db.session.execute(db.select(
+            db.select(db.func.min(Game.price_cents)).scalar_subquery(),
+            db.select(db.func.max(Game.price_cents)).scalar_subquery(),
+            db.select(db.func.min(Game.size_mb)).scalar_subquery(),
+            db.select(db.func.max(Game.size_mb)).scalar_subquery(),
+        )).one()
+        # Only genres that still have at least one game
+        genres = db.session.scalars(
+            db.select(Genre.name)
+            .where(Genre.id.in_(db.select(game_genre.c.genre_id)))
+            .order_by(Genre.name)
+        ).all()
+
+        with self._lock:
+            self._reset()
+            self.genres = genres
+            if bounds[0] is not None:
+                self.min_price_val = bounds[0] / 100
+                self.max_price_val = bounds[1] / 100
+                self.min_size_val = bounds[2] / 1024
+                self.max_size_val = bounds[3] / 1024
+            self._loaded = True
+            self.version += 1
+
+    def invalidate(self):
+        """Drop the cache so it gets rebuilt on next use (call after the catalogue changes)."""
+        with self._lock:
+            self._loaded = False
+            self.version += 1
+
+    def all_genres(self):
+        """Sorted list of every genre in the catalogue."""
+        return list(self.genres)
+
+
+def owned_ids_select(owned):
+    """
+    SELECT over the ids in an OwnedGames set, for use in IN / NOT IN.
+    - The ids go in as one JSON parameter (json_each), so any number of them is fine.
+    """
+    ids = db.func.json_each(owned.as_json()).table_valued("value")
+    return db.select(ids.c.value)
+
+def search_expression(text):
+    """
+    Turn what the user typed into an FTS5 MATCH expression.
+    - Every word must match, and the last one may be a prefix (search-as-you-type).
+    - Returns None if there is nothing searchable in the text.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    # Quote each word so FTS5 operators (AND, NEAR, ...) are treated as plain text
+    return " ".join('"%s"*' % word for word in words)
+
+def title_matches(title):
+    """SELECT of the ids of the games a catalogue title search finds (unranked, see catalogue_query)."""
+    expression = search_expression(title)
+    if expression:
+        return db.select(game_fts.c.rowid).where(literal_column("game_fts").op("MATCH")(expression))
+    return db.select(Game.id).where(Game.title.icontains(title, autoescape=True))
+
+def parse_catalogue_filters(args, index):
+    """
+    Read the filters from request arguments (the /catalogue page and the JSON API take the same ones).
+    - A bound at or past the end of its slider becomes None, so the query doesn't filter on it.
+    - NaN/inf are dropped and a bound past the other end is clamped to just beyond it (it still matches
+      nothing, but stays small enough to convert to cents/MB and bind in SQLite).
+    - Genres are de-duplicated and sorted and the title is trimmed, so equal filters compare equal
+      (the result is usable as a cache key).
+    """
+    def bound(name, low, high, is_min):
+        value = args.get(name, type=float)
+        if value is None or not math.isfinite(value) or (value <= low if is_min else value >= high):
+            return None
+        return min(value, high + 1) if is_min else max(value, low - 1)
+
+    return CatalogueFilters(
+        title=args.get("title", "", type=str).strip(),
+        genres=tuple(sorted(set(args.getlist("genres")))),
+        min_price=bound("min_price", index.min_price_val, index.max_price_val, True),
+        max_price=bound("max_price", index.min_price_val, index.max_price_val, False),
+        min_size=bound("min_size", index.min_size_val, index.max_size_val, True),
+        max_size=bound("max_size", index.min_size_val, index.max_size_val, False),
+        sort=args.get("sort", "relevance", type=str),
+    )
+
+def typed_bounds(min_price, max_price, min_size, max_size):
+    """
+    Slider values (dollars/GB) as inclusive bounds on the price_cents/size_mb columns.
+    Returns (min_cents, max_cents, min_mb, max_mb); None stays None (unbounded).
+    """
+    def whole(value, scale, rounding):
+        return None if value is None else rounding(round(value * scale, 6))
+
+    return (
+        whole(min_price, 100, math.ceil),
+        whole(max_price, 100, math.floor),
+        whole(min_size, 1024, math.ceil),
+        whole(max_size, 1024, math.floor),
+    )
+
+def catalogue_query(title="", genres=None, min_price=None, max_price=None,
+                    min_size=None, max_size=None, exclude_owned=None, sort="relevance"):
+    """
+    Build the single query behind the catalogue filters (see CatalogueQuery).
+    - 'title' is a full-text search over title, description, developer and publisher,
+      ranked by bm25 (best match first).
+    - Price (dollars) and size (GB) bounds are inclusive; None means unbounded.
+    - Genres match if the game has any of the selected genres.
+    - Games in 'exclude_owned' (an OwnedGames set) are left out.
+    - 'sort' is one of SORT_ORDERS; every order ends with the id so it's stable for keyset pagination.
+    """
+    query = Game.query
+    min_cents, max_cents, min_mb, max_mb = typed_bounds(min_price, max_price, min_size, max_size)
+    if min_cents is not None:
+        query = query.filter(Game.price_cents >= min_cents)
+    if max_cents is not None:
+        query = query.filter(Game.price_cents <= max_cents)
+    if min_mb is not None:
+        query = query.filter(Game.size_mb >= min_mb)
+    if max_mb is not None:
+        query = query.filter(Game.size_mb <= max_mb)
+    matches = None
+    if title:
+        expression = search_expression(title)
+        if expression:
+            matches = (
+                db.select(
+                    game_fts.c.rowid.label("game_id"),
+                    db.func.bm25(literal_column("game_fts"), *SEARCH_WEIGHTS).label("rank"),
+                )
+                .where(literal_column("game_fts").op("MATCH")(expression))
+                .subquery()
+            )
+            query = query.join(matches, matches.c.game_id == Game.id)
+        else:
+            # Nothing word-like to search for (e.g. only symbols), fall back to a substring match
+            query = query.filter(Game.title.icontains(title, autoescape=True))
+    if genres:
+        query = query.filter(Game.id.in_(
+            db.select(game_genre.c.game_id)
+            .join(Genre, Genre.id == game_genre.c.genre_id)
+            .where(Genre.name.in_(genres))
+        ))
+    if exclude_owned:
+        query = query.filter(Game.id.not_in(owned_ids_select(exclude_owned)))
+
+    if sort == "relevance" and matches is not None:
+        sort_columns = [matches.c.rank, Game.id]
+    elif sort == "price":
+        sort_columns = [Game.price_cents, Game.id]
+    elif sort == "size":
+        sort_columns = [Game.size_mb, Game.id]
+    else:
+        # Title order is also what "relevance" means when nothing is being searched
+        sort = "title"
+        sort_columns = [Game.title.collate("NOCASE"), Game.id]
+    return CatalogueQuery(query, sort, sort_columns)
+
+
+# Shared instance used by the routes
+catalogue_index = CatalogueIndex()
+
+# Another process edited or deleted a game
+cache_sync.on("catalogue", lambda _argument: catalogue_index.invalidate())
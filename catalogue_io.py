@@ -0,0 +1,256 @@
+# Bulk import/export of the game catalogue as CSV or JSON Lines, streamed in bounded memory
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+import click
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import migrations
+from caches import cache_sync
+from catalogue_index import catalogue_index
+from models import db, Game, Genre, game_genre, utcnow
+from utils import check_price, check_size, split_genres
+
+# Columns read and written, in file order ('id' is optional on import: rows without one are added)
+FIELDS = ("id", "title", "description", "developer", "publisher", "price", "genre", "size", "video_link")
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(path, fmt=None):
+    """The file format: 'fmt' if given, otherwise guessed from the file extension."""
+    if fmt:
+        return fmt
+    if path.lower().endswith(".csv"):
+        return "csv"
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise click.UsageError(f"Can't tell the format of {path!r}: pass --format csv or --format jsonl")
+
+@contextmanager
+def open_text(path, mode):
+    """Open 'path' for streaming text I/O ('-' means stdin/stdout)."""
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+    with open(path, mode, newline="", encoding="utf-8-sig" if mode == "r" else "utf-8") as f:
+        yield f
+
+def read_rows(stream, fmt):
+    """Yield (line number, raw dict) for every record in a CSV or JSONL stream, one at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for raw in reader:
+            yield reader.line_num, raw
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            raw = ValueError(f"invalid JSON ({e})")
+        yield line_number, raw
+
+def validate_row(raw):
+    """
+    Turn one raw record into 'game' column values, or raise ValueError.
+    - price must be readable by parse_price (no silent 0); size follows parse_size, so text like 'N/A'
+      is kept and counts as 0 MB, as it does for the games already stored.
+    - title and price are required; blank optional fields become NULL, other values are kept as given
+      (not stripped), so an export imports back unchanged.
+    - Text lengths aren't checked: SQLite doesn't enforce the String(n) lengths and stored games exceed them.
+    """
+    if isinstance(raw, Exception):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValueError("expected an object")
+    row = {}
+    for name in FIELDS[1:]:
+        value = raw.get(name)
+        value = None if value is None else str(value)
+        row[name] = value if value and value.strip() else None
+    if not row["title"]:
+        raise ValueError("title is required")
+    if row["price"] is None:
+        raise ValueError("price is required")
+
+    game_id = raw.get("id")
+    if game_id in (None, ""):
+        row["id"] = None
+    else:
+        try:
+            row["id"] = int(game_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid id {game_id!r}") from None
+        if row["id"] <= 0:
+            raise ValueError(f"invalid id {game_id!r}")
+
+    row["price_cents"] = check_price(row["price"])
+    row["size_mb"] = check_size(row["size"])
+    return row
+
+class GenreIds:
+    """Genre name -> id, loaded once and extended as an import meets new names."""
+
+    def __init__(self):
+        self._ids = dict(db.session.execute(db.select(Genre.name, Genre.id)).all())
+
+    def resolve(self, names):
+        missing = [name for name in dict.fromkeys(names) if name not in self._ids]
+        if missing:
+            db.session.execute(
+                sqlite_insert(Genre.__table__).on_conflict_do_nothing(),
+                [{"name": name} for name in missing],
+            )
+            self._ids.update(db.session.execute(db.select(Genre.name, Genre.id).where(Genre.name.in_(missing))).all())
+        return [self._ids[name] for name in names]
+
+def upsert_games(rows, genre_ids):
+    """
+    Insert or update one chunk of validated rows, then replace their genre links.
+    - One batched upsert on 'id' (rows without an id get a new one).
+    - Returns the ids of the games written, in row order.
+    """
+    # A chunk can't upsert the same id twice in one batch: keep the last version of each
+    last = {}
+    for row in rows:
+        last[row["id"] if row["id"] is not None else object()] = row
+    rows = list(last.values())
+
+    table = Game.__table__
+    statement = sqlite_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={
+            **{name: statement.excluded[name] for name in rows[0] if name != "id"},
+            # An updated game is a new version (details pages and their ETags change)
+            "version": table.c.version + 1,
+            "updated_at": utcnow(),
+        },
+    ).returning(table.c.id, sort_by_parameter_order=True)
+    ids = db.session.scalars(statement, rows).all()
+
+    genre_names = [list(dict.fromkeys(split_genres(row["genre"]))) for row in rows]
+    flat = genre_ids.resolve([name for names in genre_names for name in names])
+    db.session.execute(game_genre.delete().where(game_genre.c.game_id.in_(ids)))
+    links, position = [], 0
+    for game_id, names in zip(ids, genre_names):
+        links.extend({"game_id": game_id, "genre_id": genre_id} for genre_id in flat[position:position + len(names)])
+        position += len(names)
+    if links:
+        db.session.execute(game_genre.insert(), links)
+    return ids
+
+def import_games(stream, fmt, batch_size=5000, max_errors=100, echo=print):
+    """
+    Stream games from 'stream' into the database, 'batch_size' rows per transaction.
+    - Invalid rows are reported and skipped; stops after 'max_errors' of them.
+    - The search index is rebuilt once at the end, and every worker's catalogue caches are dropped.
+    Returns (games written, rows rejected).
+    """
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'game_fts'")
+    ).first()
+    if not exists:
+        raise click.ClickException("The database is out of date: run 'flask upgrade-db' first.")
+
+    started = time.perf_counter()
+    written = rejected = 0
+    genre_ids = GenreIds()
+    chunk = []
+
+    def flush():
+        nonlocal written
+        written += len(upsert_games(chunk, genre_ids))
+        db.session.commit()
+        chunk.clear()
+        elapsed = time.perf_counter() - started
+        echo(f"  {written:,} games ({written / elapsed:,.0f}/s)")
+
+    try:
+        with migrations.search_index_paused():
+            for line_number, raw in read_rows(stream, fmt):
+                try:
+                    chunk.append(validate_row(raw))
+                except ValueError as e:
+                    rejected += 1
+                    echo(f"  line {line_number}: {e}")
+                    if rejected >= max_errors:
+                        raise click.ClickException(f"Stopped after {rejected} invalid rows.")
+                    continue
+                if len(chunk) >= batch_size:
+                    flush()
+            if chunk:
+                flush()
+    finally:
+        # Earlier chunks are committed even if a later one failed: let every worker see them
+        cache_sync.bump("catalogue")
+        db.session.commit()
+        catalogue_index.invalidate()
+
+    elapsed = time.perf_counter() - started
+    echo(f"Imported {written:,} games ({rejected:,} rejected) in {elapsed:.1f}s "
+         f"({written / max(elapsed, 1e-9):,.0f} games/s)")
+    return written, rejected
+
+def export_games(stream, fmt, batch_size=5000, echo=print):
+    """Write every game to 'stream' in id order, reading 'batch_size' rows at a time. Returns the count."""
+    columns = [getattr(Game, name) for name in FIELDS]
+    result = db.session.execute(
+        db.select(*columns).order_by(Game.id).execution_options(yield_per=batch_size)
+    )
+    started = time.perf_counter()
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(FIELDS)
+        for partition in result.partitions():
+            writer.writerows(partition)
+            count += len(partition)
+    else:
+        for partition in result.partitions():
+            stream.writelines(
+                json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n" for row in partition
+            )
+            count += len(partition)
+    echo(f"Exported {count:,} games in {time.perf_counter() - started:.1f}s")
+    return count
+
+def init_app(app):
+    """Register the 'flask games import' and 'flask games export' commands."""
+
+    @app.cli.group("games")
+    def games_group():
+        """Bulk import/export of the game catalogue."""
+
+    @games_group.command("import")
+    @click.argument("path")
+    @click.option("--format", "fmt", type=click.Choice(FORMATS), help="File format (default: from the extension).")
+    @click.option("--batch-size", type=click.IntRange(min=1), default=5000, show_default=True,
+                  help="Rows per transaction.")
+    @click.option("--max-errors", type=click.IntRange(min=1), default=100, show_default=True,
+                  help="Give up after this many invalid rows.")
+    def import_command(path, fmt, batch_size, max_errors):
+        """
+        Add or update games from a CSV or JSONL file ('-' for stdin).
+
+        Rows with an id that exists update that game, all other rows add a new one.
+        """
+        fmt = detect_format(path, fmt)
+        with open_text(path, "r") as stream:
+            import_games(stream, fmt, batch_size=batch_size, max_errors=max_errors,
+                         echo=lambda message: click.echo(message, err=True))
+
+    @games_group.command("export")
+    @click.argument("path")
+    @click.option("--format", "fmt", type=click.Choice(FORMATS), help="File format (default: from the extension).")
+    def export_command(path, fmt):
+        """Write every game to a CSV or JSONL file ('-' for stdout)."""
+        fmt = detect_format(path, fmt)
+        with open_text(path, "w") as stream:
+            export_games(stream, fmt, echo=lambda message: click.echo(message, err=True))
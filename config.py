@@ -7,5 +7,59 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 class Config:
     # read SECRET_KEY from environment; no default secret is stored in code
     SECRET_KEY = os.environ.get("SECRET_KEY") or "verysecretkeyhehe"
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "app.db")
+    # DATABASE_URL lets scripts (e.g. the benchmarks) point the app at another database
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or "sqlite:///" + os.path.join(BASE_DIR, "app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # How many rows the paginated lists load per request
+    PAGE_SIZE = 24
+    ADMIN_PAGE_SIZE = 50
+    # Queries slower than this (milliseconds) are logged and shown on /admin/metrics
+    SLOW_QUERY_MS = int(os.environ.get("SLOW_QUERY_MS", 100))
+    # Optional bearer token that lets a Prometheus scraper read /metrics without logging in
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    # PRAGMAs run on every new SQLite connection (none in development: the defaults are fine)
+    SQLITE_PRAGMAS = {}
+    # How often (seconds) each process checks whether another process changed cached data
+    CACHE_SYNC_INTERVAL = float(os.environ.get("CACHE_SYNC_INTERVAL", 1.0))
+    # How long (seconds) a process may reuse a logged-in user's id/email/admin flag without re-reading them
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60.0))
+    # Password hashing: Werkzeug method with its cost parameters (older hashes are upgraded at login)
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_SALT_LENGTH = 16
+    # Hashes run on this many threads per process (0 = in the request thread, unbounded);
+    # this many more may wait, beyond that (or after the timeout, in seconds) the request gets a 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 8))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 5.0))
+    # A cached game page may show a "players also own" strip this many seconds old (the rest changes with the game)
+    GAME_PAGE_REFRESH = int(os.environ.get("GAME_PAGE_REFRESH", 300))
+    # Compiled templates are kept here so a new worker process doesn't compile them again
+    # (None: a per-user directory under the system temp dir; 'flask warm-up' fills it ahead of time)
+    TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR")
+    # Compile templates and load the catalogue data when a worker starts instead of in its first requests
+    # (see warmup.py and gunicorn.conf.py)
+    WARM_UP = os.environ.get("WARM_UP", "0") == "1"
+
+class ProductionConfig(Config):
+    """
+    Settings for running several WSGI worker processes against the same SQLite file.
+    - WAL lets readers keep going while a checkout or admin edit is writing.
+    - Writers wait on a locked database (busy_timeout) instead of failing straight away.
+    - Workers warm up before taking requests (WARM_UP=0 turns it off).
+    """
+    DEBUG = False
+    SQLITE_PRAGMAS = {
+        "busy_timeout": 5000,         # Milliseconds; first, so the other PRAGMAs wait for locks too
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",      # Safe with WAL; only the last commits can be lost on power failure
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,     # Negative means KiB, so 64 MB per connection
+        "temp_store": "MEMORY",
+    }
+    WARM_UP = os.environ.get("WARM_UP", "1") == "1"
+    # One connection per request thread; keep them open between requests
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 8)),
+        "max_overflow": 4,
+        "pool_timeout": 10,
+    }
@@ -0,0 +1,32 @@
+# Database setup shared by every app instance: Flask-SQLAlchemy plus per-connection SQLite PRAGMAs
+from sqlalchemy import event
+
+from models import db
+
+
+def init_app(app):
+    """
+    Initialize Flask-SQLAlchemy for 'app'.
+    - Runs every PRAGMA in the SQLITE_PRAGMAS config on each new pooled connection
+      (journal mode, sync level, busy timeout, cache sizes, ...).
+    """
+    db.init_app(app)
+    pragmas = app.config.get("SQLITE_PRAGMAS") or {}
+    if not pragmas:
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if name == "journal_mode":
+                # Stored in the database file, and switching needs a lock: only do it once
+                current = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+                if current.lower() == str(value).lower():
+                    continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
@@ -0,0 +1,158 @@
+# Facet counts for the catalogue filters (games per genre, price/size histograms), from in-memory bitsets
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from catalogue_index import title_matches, typed_bounds
+from models import db, Game, Genre, game_genre
+
+# Bars in the price and size histograms (equal-width, between the ends of each slider)
+HISTOGRAM_BUCKETS = 20
+
+# Equal-count blocks per range column: a range filter takes whole blocks from prefix bitsets
+# and only checks the games of the (at most two) blocks it cuts through
+RANGE_BLOCKS = 64
+
+
+def bitset(positions, size):
+    """An int with bit p set for every p in 'positions' (all below 'size')."""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+class RangeColumn:
+    """
+    One numeric column (price_cents or size_mb) of every game, as bitsets over game positions.
+    - range_bits(low, high) is the set of games with low <= value <= high.
+    - 'buckets' are the histogram bars: HISTOGRAM_BUCKETS equal-width ranges from the lowest to the highest value.
+    """
+
+    def __init__(self, values):
+        size = len(values)
+        self.size = size
+        # Game positions in value order, and the values in that order (for bisect)
+        self.order = array("l", sorted(range(size), key=values.__getitem__))
+        self.sorted_values = array("l", (values[position] for position in self.order))
+        self.block_size = max(1, -(-size // RANGE_BLOCKS))
+        # prefix[k] is every game in the first k blocks
+        self.prefix = [0]
+        for start in range(0, size, self.block_size):
+            self.prefix.append(self.prefix[-1] | bitset(self.order[start:start + self.block_size], size))
+
+        low, high = (self.sorted_values[0], self.sorted_values[-1]) if size else (0, 0)
+        width = (high - low) / HISTOGRAM_BUCKETS or 1
+        members = [[] for _ in range(HISTOGRAM_BUCKETS)]
+        for position, value in enumerate(values):
+            members[min(int((value - low) / width), HISTOGRAM_BUCKETS - 1)].append(position)
+        self.buckets = [bitset(positions, size) for positions in members]
+
+    def range_bits(self, low=None, high=None):
+        """Games with low <= value <= high (None: unbounded)."""
+        start = 0 if low is None else bisect_left(self.sorted_values, low)
+        end = self.size if high is None else bisect_right(self.sorted_values, high)
+        if start >= end:
+            return 0
+        first_block = -(-start // self.block_size)  # First block that starts inside the range
+        last_block = end // self.block_size  # Block the range ends in
+        if first_block >= last_block:
+            return bitset(self.order[start:end], self.size)
+        whole = self.prefix[last_block] ^ self.prefix[first_block]
+        cut = self.order[start:first_block * self.block_size] + self.order[last_block * self.block_size:end]
+        return whole | bitset(cut, self.size)
+
+
+class FacetSnapshot:
+    """Bitsets for every game as of one catalogue version (bit p = the p-th game in id order)."""
+
+    def __init__(self, version, ids, prices, sizes, genre_members):
+        self.version = version
+        self.game_count = len(ids)
+        # Game id -> bit position
+        self.positions = dict(zip(ids, range(len(ids))))
+        self.all = (1 << len(ids)) - 1
+        self.price = RangeColumn(prices)
+        self.size = RangeColumn(sizes)
+        self.genres = {name: bitset(map(self.positions.__getitem__, game_ids), len(ids))
+                       for name, game_ids in genre_members.items()}
+
+    def bits_for(self, game_ids):
+        """Bitset of the given game ids (ids that aren't in the snapshot are ignored)."""
+        positions = map(self.positions.get, game_ids)
+        return bitset([position for position in positions if position is not None], self.game_count)
+
+
+class FacetIndex:
+    """
+    Counts for the catalogue filter bar, computed from bitsets in one pass per request.
+    - Loaded lazily and reloaded whenever the catalogue index's version moves on (edits, deletes, imports).
+    - Each facet counts the games matching every *other* filter, so a genre shows how many games
+      ticking it would add and the histograms show where the games are along each slider.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def snapshot(self, index):
+        """The bitsets for the current catalogue version of 'index' (a CatalogueIndex)."""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != index.version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot.version != index.version:
+                    snapshot = self._snapshot = self.load(index.version)
+        return snapshot
+
+    def load(self, version):
+        rows = db.session.execute(db.select(Game.id, Game.price_cents, Game.size_mb).order_by(Game.id)).all()
+        genre_members = {}
+        links = db.session.execute(
+            db.select(Genre.name, game_genre.c.game_id).join(Genre, Genre.id == game_genre.c.genre_id)
+        )
+        for name, game_id in links:
+            genre_members.setdefault(name, []).append(game_id)
+        return FacetSnapshot(
+            version,
+            [row.id for row in rows],
+            [row.price_cents for row in rows],
+            [row.size_mb for row in rows],
+            genre_members,
+        )
+
+    def counts(self, index, filters, owned):
+        """
+        Facet counts for one catalogue request, as a JSON-friendly dict:
+        {"total": games matching every filter, "genres": {name: count}, "price": [bar counts], "size": [bar counts]}.
+        - 'filters' is a CatalogueFilters, 'owned' the user's OwnedGames (left out of every count).
+        """
+        snapshot = self.snapshot(index)
+        base = snapshot.all & ~snapshot.bits_for(owned)
+        if filters.title:
+            # The same search as the catalogue query, but only the ids (no ranking)
+            base &= snapshot.bits_for(db.session.scalars(title_matches(filters.title)))
+        min_cents, max_cents, min_mb, max_mb = typed_bounds(
+            filters.min_price, filters.max_price, filters.min_size, filters.max_size
+        )
+        price = snapshot.price.range_bits(min_cents, max_cents)
+        size = snapshot.size.range_bits(min_mb, max_mb)
+        genres = snapshot.all
+        if filters.genres:
+            genres = 0
+            for name in filters.genres:
+                genres |= snapshot.genres.get(name, 0)
+
+        by_genre = base & price & size
+        by_price = base & genres & size
+        by_size = base & genres & price
+        return {
+            "total": (by_genre & genres).bit_count(),
+            "genres": {name: (by_genre & bits).bit_count() for name, bits in snapshot.genres.items()},
+            "price": [(by_price & bits).bit_count() for bits in snapshot.price.buckets],
+            "size": [(by_size & bits).bit_count() for bits in snapshot.size.buckets],
+        }
+
+
+# Shared instance used by the routes
+facet_index = FacetIndex()
@@ -0,0 +1,29 @@
+# Gunicorn settings for: gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+# Processes for the CPU-bound parts (templates, password hashing), threads to overlap waiting on SQLite.
+# Keep threads at or below ProductionConfig's pool_size so no request waits for a connection.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread"
+
+# Each worker imports the app after the fork, so no SQLite connection is shared between processes
+preload_app = False
+
+timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    """Warm the new worker up (templates, catalogue data) before it takes requests, unless WARM_UP=0."""
+    app = worker.wsgi
+    if app.config["WARM_UP"]:
+        import warmup
+
+        timings = warmup.warm_up(app)
+        worker.log.info("Warmed up in %.0f ms (%s)", 1000 * sum(timings.values()),
+                        ", ".join(f"{name} {1000 * seconds:.0f} ms" for name, seconds in timings.items()))
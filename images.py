@@ -0,0 +1,160 @@
+# Responsive image pipeline: resized WebP/JPEG variants of the covers and banners, plus srcset markup
+import json
+import os
+import time
+
+import click
+from flask import url_for
+from markupsafe import Markup, escape
+
+from utils import JsonManifest
+
+STATIC_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "static")
+VARIANTS_DIR = "images/variants"               # relative to static/
+MANIFEST_PATH = os.path.join(STATIC_DIR, "images", "manifest.json")
+
+# Source folders (relative to static/) and the widths to generate for each.
+# Widths larger than the original are skipped (we never upscale).
+IMAGE_SETS = {
+    "images/covers": (160, 240, 300),
+    "images/banners": (480, 720, 960, 1440, 1920),
+}
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def _variant_path(source, width, ext):
+    """static/-relative path of one variant, e.g. images/variants/covers/1-cover-240.webp"""
+    folder, name = os.path.split(source)
+    stem = os.path.splitext(name)[0]
+    return f"{VARIANTS_DIR}/{os.path.basename(folder)}/{stem}-{width}.{ext}"
+
+def _build_one(source, widths, force):
+    """
+    Generate the variants of one image (runs in a worker process).
+    Returns (source, manifest entry, number of files written).
+    """
+    from PIL import Image
+
+    source_file = os.path.join(STATIC_DIR, source)
+    source_mtime = os.path.getmtime(source_file)
+    written = 0
+    with Image.open(source_file) as original:
+        original_width, original_height = original.size
+        image = original.convert("RGB")
+    entry = {"width": original_width, "height": original_height, "variants": {ext: [] for ext in FORMATS}}
+
+    for width in widths:
+        if width > original_width:
+            continue
+        height = round(original_height * width / original_width)
+        resized = None
+        for ext, options in FORMATS.items():
+            path = _variant_path(source, width, ext)
+            entry["variants"][ext].append([width, path])
+            target = os.path.join(STATIC_DIR, path)
+            # Skip files that are newer than their source
+            if not force and os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+                continue
+            if resized is None:
+                resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            resized.save(target, **options)
+            written += 1
+    return source, entry, written
+
+def build_variants(force=False, workers=None, echo=print):
+    """Generate every missing/outdated variant in parallel and write the manifest."""
+    jobs = []
+    for folder, widths in IMAGE_SETS.items():
+        directory = os.path.join(STATIC_DIR, folder)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith((".jpg", ".jpeg", ".png")):
+                jobs.append((f"{folder}/{name}", widths))
+
+    # Only needed by this command, so web workers don't import multiprocessing at start-up
+    from concurrent.futures import ProcessPoolExecutor
+
+    started = time.perf_counter()
+    manifest, written = {}, 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_build_one, source, widths, force) for source, widths in jobs]
+        for done, future in enumerate(futures, 1):
+            source, entry, count = future.result()
+            manifest[source] = entry
+            written += count
+            if done % 50 == 0 or done == len(futures):
+                echo(f"  {done}/{len(futures)} images")
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, separators=(",", ":"), sort_keys=True)
+    echo(f"Wrote {written} variant files for {len(jobs)} images in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+# Shared instance used by the templates
+image_manifest = JsonManifest(MANIFEST_PATH)
+
+
+def image_sources(source):
+    """
+    URLs of an image under static/, as data (also used by pages that render cards in the browser).
+    - {"src": url} if no variants were built.
+    - Otherwise also "webp" and "jpeg" srcsets and the "width"/"height" of the original.
+    """
+    entry = image_manifest.get(source)
+    if not entry:
+        return {"src": url_for("static", filename=source)}
+
+    def srcset(variants):
+        return ", ".join(f'{url_for("static", filename=path)} {width}w' for width, path in variants)
+
+    jpegs = entry["variants"]["jpeg"]
+    return {
+        "src": url_for("static", filename=jpegs[-1][1] if jpegs else source),
+        "webp": srcset(entry["variants"]["webp"]),
+        "jpeg": srcset(jpegs),
+        "width": entry["width"],
+        "height": entry["height"],
+    }
+
+def responsive_image(source, alt="", sizes="100vw", class_="", loading="lazy"):
+    """
+    <picture> markup for an image under static/ with WebP and JPEG srcsets from the manifest.
+    - Falls back to a plain <img> of the original file if no variants were built.
+    """
+    alt = escape(alt)
+    image = image_sources(source)
+    if "webp" not in image:
+        return Markup(f'<img src="{image["src"]}" class="{class_}" alt="{alt}" loading="{loading}">')
+    return Markup(
+        "<picture>"
+        f'<source type="image/webp" srcset="{image["webp"]}" sizes="{sizes}">'
+        f'<img src="{image["src"]}" srcset="{image["jpeg"]}" sizes="{sizes}" '
+        f'width="{image["width"]}" height="{image["height"]}" '
+        f'class="{class_}" alt="{alt}" loading="{loading}" decoding="async">'
+        "</picture>"
+    )
+
+def init_app(app):
+    """Register the 'flask images build' command and the responsive_image() template helper."""
+    app.jinja_env.globals["responsive_image"] = responsive_image
+
+    @app.cli.group("images")
+    def images_group():
+        """Build resized cover/banner variants."""
+
+    @images_group.command("build")
+    @click.option("--force", is_flag=True, help="Regenerate variants even if they are up to date.")
+    @click.option("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    def build_command(force, workers):
+        """Generate WebP/JPEG width variants of every cover and banner and write the manifest."""
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise click.ClickException("Pillow is needed to build images: pip install Pillow")
+        build_variants(force=force, workers=workers, echo=click.echo)
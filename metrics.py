@@ -0,0 +1,193 @@
+# Request and SQL instrumentation (latency histograms, query counts, slow-query log)
+import logging
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("bitforge.sql")
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+
+
+class EndpointStats:
+    """Latency histogram plus SQL totals for one endpoint."""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+
+    def observe(self, seconds, sql_statements, sql_seconds):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total_seconds += seconds
+        self.sql_statements += sql_statements
+        self.sql_seconds += sql_seconds
+
+    def percentile(self, fraction):
+        """Estimate a latency percentile (upper bound of the bucket it falls in)."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+
+class Metrics:
+    """
+    Process-wide collector filled in by the Flask and SQLAlchemy hooks below.
+    - Per-endpoint latency histograms.
+    - Per-request SQL statement count and time (also sent back in a Server-Timing header).
+    - The most recent slow queries (slower than SLOW_QUERY_MS).
+    """
+
+    def __init__(self, slow_query_seconds=0.1, slow_query_log_size=50):
+        self._lock = threading.Lock()
+        self.slow_query_seconds = slow_query_seconds
+        self.endpoints = {}
+        self.slow_queries = deque(maxlen=slow_query_log_size)
+        self.slow_query_count = 0
+        self.started = time.time()
+
+    def observe_request(self, endpoint, seconds, sql_statements, sql_seconds):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.observe(seconds, sql_statements, sql_seconds)
+
+    def observe_slow_query(self, statement, seconds, endpoint):
+        with self._lock:
+            self.slow_query_count += 1
+            self.slow_queries.appendleft({
+                "when": time.time(),
+                "endpoint": endpoint,
+                "ms": seconds * 1000,
+                "statement": " ".join(statement.split()),
+            })
+        logger.warning("Slow query (%.1f ms) on %s: %s", seconds * 1000, endpoint, statement)
+
+    def snapshot(self):
+        """Copy of the per-endpoint stats, safe to read while requests keep coming in."""
+        with self._lock:
+            rows = []
+            for endpoint, stats in sorted(self.endpoints.items()):
+                copy = EndpointStats()
+                copy.__dict__.update(stats.__dict__, buckets=list(stats.buckets))
+                rows.append((endpoint, copy))
+            return rows, list(self.slow_queries)
+
+    def prometheus_text(self, cache_stats=None):
+        """All metrics in the Prometheus text exposition format."""
+        endpoints, _ = self.snapshot()
+        lines = [
+            "# HELP bitforge_request_duration_seconds Request latency by endpoint.",
+            "# TYPE bitforge_request_duration_seconds histogram",
+        ]
+        for endpoint, stats in endpoints:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'bitforge_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+            lines.append(f'bitforge_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats.total_seconds}')
+            lines.append(f'bitforge_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats.count}')
+
+        lines += [
+            "# HELP bitforge_sql_statements_total SQL statements executed, by endpoint.",
+            "# TYPE bitforge_sql_statements_total counter",
+        ]
+        lines += [f'bitforge_sql_statements_total{{endpoint="{e}"}} {s.sql_statements}' for e, s in endpoints]
+        lines += [
+            "# HELP bitforge_sql_duration_seconds_total Time spent in SQL, by endpoint.",
+            "# TYPE bitforge_sql_duration_seconds_total counter",
+        ]
+        lines += [f'bitforge_sql_duration_seconds_total{{endpoint="{e}"}} {s.sql_seconds}' for e, s in endpoints]
+        lines += [
+            "# HELP bitforge_slow_queries_total Queries slower than the slow-query threshold.",
+            "# TYPE bitforge_slow_queries_total counter",
+            f"bitforge_slow_queries_total {self.slow_query_count}",
+        ]
+
+        if cache_stats:
+            lines += [
+                "# HELP bitforge_cache_hits_total Cache lookups that found an entry.",
+                "# TYPE bitforge_cache_hits_total counter",
+            ]
+            lines += [f'bitforge_cache_hits_total{{cache="{name}"}} {c["hits"]}' for name, c in cache_stats.items()]
+            lines += [
+                "# HELP bitforge_cache_misses_total Cache lookups that found nothing.",
+                "# TYPE bitforge_cache_misses_total counter",
+            ]
+            lines += [f'bitforge_cache_misses_total{{cache="{name}"}} {c["misses"]}' for name, c in cache_stats.items()]
+            lines += [
+                "# HELP bitforge_cache_entries Entries currently held by a cache.",
+                "# TYPE bitforge_cache_entries gauge",
+            ]
+            lines += [f'bitforge_cache_entries{{cache="{name}"}} {c["entries"]}' for name, c in cache_stats.items()]
+            sized = {name: c for name, c in cache_stats.items() if "bytes" in c}
+            if sized:
+                lines += [
+                    "# HELP bitforge_cache_bytes Size of the values held by a size-capped cache.",
+                    "# TYPE bitforge_cache_bytes gauge",
+                ]
+                lines += [f'bitforge_cache_bytes{{cache="{name}"}} {c["bytes"]}' for name, c in sized.items()]
+        return "\n".join(lines) + "\n"
+
+
+# Shared collector
+collector = Metrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    endpoint = "-"
+    if has_request_context():
+        g.sql_statements = g.get("sql_statements", 0) + 1
+        g.sql_seconds = g.get("sql_seconds", 0.0) + elapsed
+        endpoint = request.endpoint or "-"
+    if elapsed >= collector.slow_query_seconds:
+        collector.observe_slow_query(statement, elapsed, endpoint)
+
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+def _record_request(response):
+    started = g.pop("request_start", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    statements = g.get("sql_statements", 0)
+    sql_seconds = g.get("sql_seconds", 0.0)
+    collector.observe_request(request.endpoint or "unknown", elapsed, statements, sql_seconds)
+    # Lets the browser dev tools show where the time went
+    response.headers["Server-Timing"] = (
+        f'sql;dur={sql_seconds * 1000:.1f};desc="{statements} queries", app;dur={elapsed * 1000:.1f}'
+    )
+    return response
+
+def init_app(app):
+    """Hook the request timers and SQL counters into the app."""
+    collector.slow_query_seconds = app.config.get("SLOW_QUERY_MS", 100) / 1000
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
@@ -0,0 +1,159 @@
+# One-shot schema upgrades for databases created by older versions of the app
+from contextlib import contextmanager
+
+import click
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from models import db, User, Game, Genre, game_genre, game_affinity
+import recommendations
+from utils import price_to_cents, size_to_mb, split_genres
+
+
+def upgrade_database():
+    """
+    Bring an existing database up to the current schema.
+    - Creates any missing tables.
+    - Adds the typed price/size columns to 'game' and backfills them.
+    - Adds the version/updated_at columns to 'game'.
+    - Creates the full-text search index.
+    - Builds the "players also own" index if it's empty.
+    - Safe to run more than once.
+    """
+    db.create_all()  # Creates new tables (e.g. genre, game_genre) but never alters old ones
+
+    # Add the typed columns if this database predates them
+    game_columns = {c["name"] for c in inspect(db.engine).get_columns("game")}
+    added_columns = False
+    for column in ("price_cents", "size_mb"):
+        if column not in game_columns:
+            db.session.execute(text(f"ALTER TABLE game ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+            added_columns = True
+    # ... and the edit version/time (SQLite can't add a column defaulting to the current time:
+    # add it NOT NULL with a constant default, then fill in the upgrade time)
+    if "version" not in game_columns:
+        db.session.execute(text("ALTER TABLE game ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    if "updated_at" not in game_columns:
+        db.session.execute(text("ALTER TABLE game ADD COLUMN updated_at DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00'"))
+        db.session.execute(text("UPDATE game SET updated_at = CURRENT_TIMESTAMP"))
+
+    # create_all() also skips indexes on tables that already existed
+    # (IF NOT EXISTS rather than checkfirst: SQLAlchemy can't reflect expression indexes like lower(email))
+    for table in (User.__table__, Game.__table__, game_genre):
+        for index in table.indexes:
+            db.session.execute(CreateIndex(index, if_not_exists=True))
+
+    if added_columns:
+        backfill_typed_fields()
+    create_search_index()
+    if not db.session.execute(db.select(game_affinity.c.game_id).limit(1)).first():
+        recommendations.rebuild()
+    db.session.commit()
+
+def backfill_typed_fields():
+    """Fill price_cents, size_mb and the genre links from the display strings (same rules as parse_price/parse_size)."""
+    rows = db.session.execute(db.select(Game.id, Game.price, Game.size, Game.genre)).all()
+    if not rows:
+        return
+
+    # Numeric columns in one executemany
+    db.session.execute(
+        Game.__table__.update()
+        .where(Game.__table__.c.id == bindparam("game_id"))
+        .values(price_cents=bindparam("cents"), size_mb=bindparam("mb")),
+        [{"game_id": r.id, "cents": price_to_cents(r.price), "mb": size_to_mb(r.size)} for r in rows],
+    )
+
+    # Genre names, then the game <-> genre links
+    game_genre_names = {r.id: list(dict.fromkeys(split_genres(r.genre))) for r in rows}
+    names = {name for genre_names in game_genre_names.values() for name in genre_names}
+    existing = set(db.session.scalars(db.select(Genre.name)))
+    missing = sorted(names - existing)
+    if missing:
+        db.session.execute(Genre.__table__.insert(), [{"name": name} for name in missing])
+    genre_ids = dict(db.session.execute(db.select(Genre.name, Genre.id)).all())
+
+    db.session.execute(game_genre.delete())
+    links = [
+        {"game_id": game_id, "genre_id": genre_ids[name]}
+        for game_id, genre_names in game_genre_names.items()
+        for name in genre_names
+    ]
+    if links:
+        db.session.execute(game_genre.insert(), links)
+
+# Full-text index over the searchable Game columns, kept in sync by triggers.
+# 'content=game' means the text itself isn't stored twice, only the index.
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE game_fts USING fts5(
+        title, description, developer, publisher,
+        content='game', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER game_fts_insert AFTER INSERT ON game BEGIN
+        INSERT INTO game_fts(rowid, title, description, developer, publisher)
+        VALUES (new.id, new.title, new.description, new.developer, new.publisher);
+    END
+    """,
+    """
+    CREATE TRIGGER game_fts_delete AFTER DELETE ON game BEGIN
+        INSERT INTO game_fts(game_fts, rowid, title, description, developer, publisher)
+        VALUES ('delete', old.id, old.title, old.description, old.developer, old.publisher);
+    END
+    """,
+    """
+    CREATE TRIGGER game_fts_update AFTER UPDATE OF title, description, developer, publisher ON game BEGIN
+        INSERT INTO game_fts(game_fts, rowid, title, description, developer, publisher)
+        VALUES ('delete', old.id, old.title, old.description, old.developer, old.publisher);
+        INSERT INTO game_fts(rowid, title, description, developer, publisher)
+        VALUES (new.id, new.title, new.description, new.developer, new.publisher);
+    END
+    """,
+]
+
+def create_search_index():
+    """Create the FTS5 search table and its triggers if missing, then index every existing game."""
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'game_fts'")
+    ).first()
+    if exists:
+        return
+    for statement in SEARCH_INDEX_DDL:
+        db.session.execute(text(statement))
+    rebuild_search_index()
+
+def rebuild_search_index():
+    """Re-index every game in one pass (after bulk changes)."""
+    db.session.execute(text("INSERT INTO game_fts(game_fts) VALUES ('rebuild')"))
+
+@contextmanager
+def search_index_paused():
+    """
+    Drop the search triggers for a bulk change to 'game', then put them back and re-index in one pass.
+    - Each block of work inside commits on its own; the index is rebuilt even if it fails part-way.
+    """
+    for statement in SEARCH_INDEX_DDL[1:]:
+        name = statement.split()[2]  # CREATE TRIGGER <name> ...
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    db.session.commit()
+    try:
+        yield
+    finally:
+        db.session.rollback()
+        for statement in SEARCH_INDEX_DDL[1:]:
+            db.session.execute(text(statement))
+        rebuild_search_index()
+        db.session.commit()
+
+def init_app(app):
+    """Register the 'flask upgrade-db' command."""
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Create missing tables/columns and backfill derived data."""
+        upgrade_database()
+        click.echo("Database is up to date.")
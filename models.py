@@ -1,15 +1,26 @@
+# Timestamps for Game.updated_at
+from datetime import datetime, timezone
+
 # Import SQLAlchemy for database interaction
 from flask_sqlalchemy import SQLAlchemy
 
 # Import UserMixin to provide default implementations for Flask-Login
 from flask_login import UserMixin
 
-# Import Werkzeug functions for password hashing (secure storage)
-from werkzeug.security import generate_password_hash, check_password_hash
+# Password hashing runs on a bounded worker pool (see passwords.py)
+from passwords import password_hasher
+
+# Helpers that turn the display strings into numbers/genre names
+from utils import price_to_cents, size_to_mb, split_genres
 
 # Create a SQLAlchemy database instance
 db = SQLAlchemy()
 
+# Current time in UTC, without tzinfo (how SQLite stores it). Microseconds are kept: with the version,
+# updated_at tells a new game from a deleted one that had the same id (ids are reused)
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 # Association table for the many-to-many relationship
 purchases = db.Table(
     'purchases',
@@ -17,7 +28,46 @@ purchases = db.Table(
     db.Column('game_id', db.Integer, db.ForeignKey('game.id'), primary_key=True)
 )
 
+# Games waiting in each user's cart (kept in the database so carts survive logout and follow the user)
+cart_item = db.Table(
+    'cart_item',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('game_id', db.Integer, db.ForeignKey('game.id'), primary_key=True)
+)
+
+# Association table linking games to their normalized genres
+game_genre = db.Table(
+    'game_genre',
+    db.Column('game_id', db.Integer, db.ForeignKey('game.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    # Lets "games in genre X" be answered from the index alone
+    db.Index('ix_game_genre_genre_id', 'genre_id', 'game_id'),
+)
+
+# How many users own both games of a pair, for the "players also own" strip (see recommendations.py).
+# Only each game's strongest pairs are kept, so the table stays sparse and bounded per game.
+game_affinity = db.Table(
+    'game_affinity',
+    db.Column('game_id', db.Integer, db.ForeignKey('game.id'), primary_key=True),
+    db.Column('other_id', db.Integer, db.ForeignKey('game.id'), primary_key=True),
+    db.Column('owners', db.Integer, nullable=False),
+    # A game's pairs in score order, read straight from the index
+    db.Index('ix_game_affinity_rank', 'game_id', 'owners', 'other_id'),
+    # Lets a deleted game be removed from every other game's list
+    db.Index('ix_game_affinity_other_id', 'other_id'),
+)
+
+# Change counters that tell other worker processes which of their caches to drop (see caches.CacheSync)
+cache_generation = db.Table(
+    'cache_generation',
+    db.Column('name', db.String(100), primary_key=True),
+    db.Column('generation', db.Integer, nullable=False, index=True),
+)
+
 class User(UserMixin, db.Model):
+    # Lower-cased email index so the admin list can search by email prefix and page through it in order
+    __table_args__ = (db.Index('ix_user_email_lower', db.text('lower(email)')),)
+
     # Primary key: unique ID for each user
     id = db.Column(db.Integer, primary_key=True)
 
@@ -34,17 +84,20 @@ class User(UserMixin, db.Model):
 
     # Hashes the password and stores it
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     # Checks if the given password matches the stored hash
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
 
     # String representation of the user object (for debugging)
     def __repr__(self):
         return f"<User {self.email}>"
 
 class Game(db.Model):
+    # Case-insensitive title index so the catalogue can page through games in title order
+    __table_args__ = (db.Index('ix_game_title_nocase', db.text('title COLLATE NOCASE')),)
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -55,5 +108,129 @@ class Game(db.Model):
     size = db.Column(db.String(50), nullable=True)
     video_link = db.Column(db.String(255), nullable=True)
 
+    # Numeric copies of price/size so filters can run (indexed) in SQL
+    price_cents = db.Column(db.Integer, nullable=False, default=0, index=True)
+    size_mb = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+    # Normalized genres (the comma-joined 'genre' string is kept for display)
+    genres = db.relationship('Genre', secondary=game_genre, backref=db.backref('games', lazy='dynamic'))
+
+    # Moved on by every edit (see touch), so pages and caches can tell versions of a game apart.
+    # The server defaults cover raw SQL inserts (e.g. benchmarks/datagen.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text("1"))
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, server_default=db.func.current_timestamp())
+
+    # Recomputes the typed columns from the display strings, call after changing price/size/genre
+    def sync_typed_fields(self):
+        self.price_cents = price_to_cents(self.price)
+        self.size_mb = size_to_mb(self.size)
+        self.genres = Genre.get_or_create_all(split_genres(self.genre))
+
+    # Marks the game as changed: the next version number (counted in SQL) and a new modification time
+    def touch(self):
+        self.version = Game.version + 1
+        self.updated_at = utcnow()
+
     def __repr__(self):
         return f"<Game {self.title}>"
+
+class Genre(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+    # Returns Genre rows for the given names, creating any that don't exist yet
+    @classmethod
+    def get_or_create_all(cls, names):
+        names = list(dict.fromkeys(names))  # Drop duplicates, keep order
+        if not names:
+            return []
+        existing = {g.name: g for g in cls.query.filter(cls.name.in_(names))}
+        genres = []
+        for name in names:
+            if name not in existing:
+                existing[name] = cls(name=name)
+                db.session.add(existing[name])
+            genres.append(existing[name])
+        return genres
+
+    def __repr__(self):
+        return f"<Genre {self.name}>"
+
+# Buys every game in game_ids for the user with a single INSERT OR IGNORE into 'purchases'.
+# Games the user already owns are skipped by the primary key instead of being checked one by one,
+# so two checkouts running at the same time (two tabs, two workers) can't clash or lose rows.
+# Returns (ids of the games newly purchased, number already owned); the caller commits.
+def purchase_games(user_id, game_ids):
+    # Resolve the cart against games that still exist
+    ids = db.session.scalars(db.select(Game.id).where(Game.id.in_(set(game_ids)))).all()
+    if not ids:
+        return [], 0
+    newly_purchased = db.session.scalars(
+        purchases.insert()
+        .prefix_with("OR IGNORE")
+        .from_select(
+            ["user_id", "game_id"],
+            db.select(db.literal(user_id), Game.id).where(Game.id.in_(ids)),
+        )
+        .returning(purchases.c.game_id)
+    ).all()
+    return newly_purchased, len(ids) - len(newly_purchased)
+
+# Puts every game in game_ids that exists into the user's cart with a single INSERT OR IGNORE,
+# so games already in the cart are skipped by the primary key.
+# Returns how many were added; the caller commits.
+def add_cart_items(user_id, game_ids):
+    result = db.session.execute(
+        cart_item.insert()
+        .prefix_with("OR IGNORE")
+        .from_select(
+            ["user_id", "game_id"],
+            db.select(db.literal(user_id), Game.id).where(Game.id.in_(set(game_ids))),
+        )
+    )
+    return result.rowcount
+
+# Takes the given games (or everything, if game_ids is None) out of the user's cart.
+# Returns how many were removed; the caller commits.
+def remove_cart_items(user_id, game_ids=None):
+    statement = cart_item.delete().where(cart_item.c.user_id == user_id)
+    if game_ids is not None:
+        statement = statement.where(cart_item.c.game_id.in_(set(game_ids)))
+    return db.session.execute(statement).rowcount
+
+# The ids of the games in the user's cart, straight from the database
+def cart_game_ids(user_id):
+    return db.session.scalars(db.select(cart_item.c.game_id).where(cart_item.c.user_id == user_id)).all()
+
+# Number of purchases of each given user, in one grouped query over the 'purchases' primary key.
+# Users without purchases are left out of the returned {user_id: count} dict.
+def purchase_counts(user_ids):
+    if not user_ids:
+        return {}
+    return dict(db.session.execute(
+        db.select(purchases.c.user_id, db.func.count())
+        .where(purchases.c.user_id.in_(set(user_ids)))
+        .group_by(purchases.c.user_id)
+    ).all())
+
+# Makes every given user who isn't one yet an admin, in a single UPDATE.
+# Returns the ids that changed; the caller commits.
+def promote_users(user_ids):
+    return db.session.scalars(
+        db.update(User)
+        .where(User.id.in_(set(user_ids)), User.is_admin.is_not(True))
+        .values(is_admin=True)
+        .returning(User.id)
+    ).all()
+
+# Deletes the given users (admins are skipped) with their purchases and cart, one statement per table.
+# Returns the ids that were deleted; the caller commits.
+def delete_users(user_ids):
+    ids = db.session.scalars(
+        db.select(User.id).where(User.id.in_(set(user_ids)), User.is_admin.is_not(True))
+    ).all()
+    if ids:
+        db.session.execute(purchases.delete().where(purchases.c.user_id.in_(ids)))
+        db.session.execute(cart_item.delete().where(cart_item.c.user_id.in_(ids)))
+        db.session.execute(db.delete(User).where(User.id.in_(ids)))
+    return ids
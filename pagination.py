@@ -0,0 +1,57 @@
+# Keyset (cursor) pagination shared by the catalogue, inventory and admin lists
+import base64
+import binascii
+import json
+
+from flask import request, url_for
+
+from models import db
+
+
+def encode_cursor(key, values):
+    """Pack the sort key name and the last row's sort values into an opaque URL-safe string."""
+    raw = json.dumps([key, list(values)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, key):
+    """Unpack a cursor made by encode_cursor, or None if it's missing, malformed or for another sort."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_key, values = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if cursor_key != key or not isinstance(values, list):
+        return None
+    return values
+
+def keyset_page(query, sort_columns, key, cursor=None, per_page=24):
+    """
+    Fetch one page of 'query' that comes after 'cursor'.
+    - sort_columns are all ascending and the last one must be unique (e.g. the id),
+      so the order is stable and every page costs the same no matter how deep it is.
+    - 'key' names the sort order; cursors from a different order are ignored.
+    - Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    values = decode_cursor(cursor, key)
+    if values is not None and len(values) == len(sort_columns):
+        # Row-value comparison: (a, b) > (last_a, last_b)
+        query = query.filter(db.tuple_(*sort_columns) > db.tuple_(*[db.literal(v) for v in values]))
+
+    # Fetch one extra row to know whether there is a next page
+    rows = query.add_columns(*sort_columns).order_by(None).order_by(*sort_columns).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    items = [row[0] for row in rows]
+    next_cursor = encode_cursor(key, rows[-1][1:]) if has_more else None
+    return items, next_cursor
+
+def next_page_url(next_cursor):
+    """URL of the current page with the same query arguments but the next cursor (None on the last page)."""
+    if not next_cursor:
+        return None
+    args = request.args.to_dict(flat=False)
+    args["cursor"] = next_cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
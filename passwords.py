@@ -0,0 +1,83 @@
+# Password hashing on a small bounded pool, so a burst of logins can't take every CPU from cheap requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when every hashing worker is busy and the queue is full; the caller should answer 503."""
+
+
+class PasswordHasher:
+    """
+    Runs Werkzeug's password hashing on at most 'workers' threads.
+    - hashlib's scrypt/pbkdf2 release the GIL, so other requests keep running meanwhile,
+      but only 'workers' hashes use the CPU at once.
+    - At most 'queue_size' more wait for a worker; beyond that (or after waiting 'timeout' seconds)
+      calls fail fast with HasherBusy.
+    - workers=0 hashes inline in the calling thread (no limit), like plain Werkzeug.
+    - 'method' is any Werkzeug method string, e.g. "scrypt", "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+    """
+
+    def __init__(self, method="scrypt:32768:8:1", salt_length=16, workers=2, queue_size=8, timeout=5.0):
+        self._executor = None
+        self.configure(method, salt_length, workers, queue_size, timeout)
+
+    def configure(self, method, salt_length, workers, queue_size, timeout):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.method = method
+        self._prefix = None  # The method with every default filled in, as stored in hashes (see needs_rehash)
+        self.salt_length = salt_length
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="password-hash") if workers else None
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+
+    def _run(self, function, *args):
+        if self._executor is None:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is freed when the work is done, even if the caller stopped waiting for it
+        future.add_done_callback(lambda _future: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy() from None
+
+    def hash(self, password):
+        """Hash 'password' with the configured method and cost."""
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def check(self, password_hash, password):
+        """True if 'password' matches 'password_hash' (made with any method Werkzeug knows)."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if 'password_hash' was made with a different method or cost than the configured one."""
+        if self._prefix is None:
+            # Short forms like "scrypt" or "pbkdf2:sha256" are stored with their defaults spelled out,
+            # so compare with the prefix of a real hash (made once, on the first login rather than at boot)
+            self._prefix = self.hash("").split("$", 1)[0]
+        return password_hash.split("$", 1)[0] != self._prefix
+
+    def init_app(self, app):
+        """Apply the PASSWORD_HASH_* settings of the app's config."""
+        self.configure(
+            app.config["PASSWORD_HASH_METHOD"],
+            app.config["PASSWORD_SALT_LENGTH"],
+            app.config["PASSWORD_HASH_WORKERS"],
+            app.config["PASSWORD_HASH_QUEUE"],
+            app.config["PASSWORD_HASH_TIMEOUT"],
+        )
+
+
+# Shared instance used by the User model
+password_hasher = PasswordHasher()
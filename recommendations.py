@@ -0,0 +1,107 @@
+# "Players also own": co-ownership counts between games, precomputed so a details page reads them in one index seek
+import time
+
+import click
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import load_only
+
+from models import db, Game, game_affinity, purchases
+
+# Related games shown on a details page
+TOP_K = 8
+
+# Pairs kept per game: the shown ones plus some slack, so a game rising into the top K already has a count
+KEEP_PER_GAME = 4 * TOP_K
+
+# Every pair of games owned by the same user, counted, keeping each game's KEEP_PER_GAME strongest
+REBUILD_SQL = text("""
+    INSERT INTO game_affinity (game_id, other_id, owners)
+    SELECT game_id, other_id, owners FROM (
+        SELECT a.game_id AS game_id, b.game_id AS other_id, count(*) AS owners,
+               row_number() OVER (PARTITION BY a.game_id ORDER BY count(*) DESC, b.game_id DESC) AS rank
+        FROM purchases AS a JOIN purchases AS b ON b.user_id = a.user_id AND b.game_id != a.game_id
+        GROUP BY a.game_id, b.game_id
+    )
+    WHERE rank <= :keep
+""")
+
+# Drops all but the KEEP_PER_GAME strongest pairs of the given games
+PRUNE_SQL = text("""
+    DELETE FROM game_affinity WHERE rowid IN (
+        SELECT rowid FROM (
+            SELECT rowid, row_number() OVER (PARTITION BY game_id ORDER BY owners DESC, other_id DESC) AS rank
+            FROM game_affinity WHERE game_id IN :game_ids
+        )
+        WHERE rank > :keep
+    )
+""").bindparams(bindparam("game_ids", expanding=True))
+
+# Games per PRUNE_SQL statement (well under SQLite's bound-variable limit)
+PRUNE_BATCH = 500
+
+
+def rebuild():
+    """Recount every pair from 'purchases' in one pass (the caller commits). Returns the number of pairs kept."""
+    db.session.execute(game_affinity.delete())
+    return db.session.execute(REBUILD_SQL, {"keep": KEEP_PER_GAME}).rowcount
+
+def record_purchases(user_id, game_ids):
+    """
+    Count the pairs a purchase just created: each new game with every other game the user owns.
+    - Call in the same transaction as the purchase, with the ids of the games newly bought.
+    - Only the games involved are touched, and only the lists that gained a pair are trimmed back
+      to KEEP_PER_GAME (in batches, so a large library stays within SQLite's bound-variable limit).
+    - A pair that was trimmed earlier starts counting again from 1; 'flask recommendations rebuild'
+      recounts everything exactly.
+    """
+    new = set(game_ids)
+    if not new:
+        return
+    owned = db.session.scalars(db.select(purchases.c.game_id).where(purchases.c.user_id == user_id)).all()
+    pairs = [(game_id, other_id) for game_id in new for other_id in owned if other_id != game_id]
+    pairs += [(other_id, game_id) for game_id in new for other_id in owned if other_id not in new]
+    if not pairs:
+        return
+    statement = sqlite_insert(game_affinity).values(owners=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[game_affinity.c.game_id, game_affinity.c.other_id],
+        set_={"owners": game_affinity.c.owners + 1},
+    ).returning(game_affinity.c.game_id, game_affinity.c.owners)
+    rows = db.session.execute(statement, [{"game_id": game_id, "other_id": other_id} for game_id, other_id in pairs])
+    # Only a list that got a new row (owners == 1) can have grown past KEEP_PER_GAME
+    grown = sorted({game_id for game_id, owners in rows if owners == 1})
+    for start in range(0, len(grown), PRUNE_BATCH):
+        db.session.execute(PRUNE_SQL, {"game_ids": grown[start:start + PRUNE_BATCH], "keep": KEEP_PER_GAME})
+
+def forget_game(game_id):
+    """Remove a game from every list, its own included (the caller commits)."""
+    db.session.execute(
+        game_affinity.delete().where((game_affinity.c.game_id == game_id) | (game_affinity.c.other_id == game_id))
+    )
+
+def related_games(game_id, limit=TOP_K):
+    """The games most often owned together with 'game_id', strongest first (just what a small card needs)."""
+    return (
+        Game.query.options(load_only(Game.id, Game.title, Game.price))
+        .join(game_affinity, game_affinity.c.other_id == Game.id)
+        .filter(game_affinity.c.game_id == game_id)
+        .order_by(game_affinity.c.owners.desc(), game_affinity.c.other_id.desc())
+        .limit(limit)
+        .all()
+    )
+
+def init_app(app):
+    """Register the 'flask recommendations rebuild' command."""
+
+    @app.cli.group("recommendations")
+    def recommendations_group():
+        """The "players also own" index."""
+
+    @recommendations_group.command("rebuild")
+    def rebuild_command():
+        """Recount which games are owned together, from every purchase."""
+        started = time.perf_counter()
+        pairs = rebuild()
+        db.session.commit()
+        click.echo(f"Kept {pairs:,} game pairs in {time.perf_counter() - started:.1f}s")
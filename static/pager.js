@@ -0,0 +1,66 @@
+// Infinite scroll for paginated lists (catalogue, inventory, admin tables).
+// Each page ends with a "Load more" link ([data-next-page]); when it scrolls into view
+// we fetch the next page and append its items to the list ([data-page-items]).
+
+(function () {
+    var observer = null;
+
+    function loadNextPage(sentinel) {
+        var link = sentinel.querySelector('a');
+        if (!link || sentinel.dataset.loading) return;
+        sentinel.dataset.loading = "true";
+
+        fetch(link.href, { headers: { "X-Requested-With": "XMLHttpRequest" } })
+            .then(function (response) { return response.text(); })
+            .then(function (html) {
+                // The list may have been replaced (e.g. filters changed) while we were loading
+                if (!sentinel.isConnected) return;
+                var list = sentinel.parentElement.querySelector('[data-page-items]');
+                var page = document.createElement('template');
+                page.innerHTML = html;
+
+                // Pages either wrap their items in [data-page-items] or send them as-is (table rows)
+                var source = page.content.querySelector('[data-page-items]') || page.content;
+                var nextSentinel = page.content.querySelector('[data-next-page]');
+                Array.from(source.children).forEach(function (item) {
+                    if (!item.matches('[data-next-page]')) list.appendChild(item);
+                });
+
+                if (nextSentinel) {
+                    sentinel.replaceWith(nextSentinel);
+                    watch(nextSentinel);
+                } else {
+                    sentinel.remove();
+                }
+            })
+            .catch(function () {
+                // Leave the link in place so the user can click it instead
+                delete sentinel.dataset.loading;
+            });
+    }
+
+    function watch(sentinel) {
+        if (observer) {
+            observer.observe(sentinel);
+        }
+    }
+
+    // Start (or restart, after a list was re-rendered) watching every "Load more" link on the page
+    window.observeNextPage = function () {
+        document.querySelectorAll('[data-next-page]').forEach(watch);
+    };
+
+    document.addEventListener("DOMContentLoaded", function () {
+        // Without IntersectionObserver the "Load more" links still work as normal links
+        if (!('IntersectionObserver' in window)) return;
+        observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    loadNextPage(entry.target);
+                }
+            });
+        }, { rootMargin: "400px" });
+        window.observeNextPage();
+    });
+})();
@@ -9,6 +9,11 @@ var minSize = window.catalogueVars.minSize;
 var maxSize = window.catalogueVars.maxSize;
 var minSizeStart = window.catalogueVars.minSizeStart;
 var maxSizeStart = window.catalogueVars.maxSizeStart;
+// Server-rendered URLs (/api/v1/games, the catalogue page, and per-game URLs for game id 0)
+var urls = window.catalogueVars.urls;
+
+// 'sizes' of the cover images, as in templates/game_card.html
+var COVER_SIZES = '(min-width: 1400px) 416px, (min-width: 768px) 33vw, (min-width: 576px) 50vw, 100vw';
 
 document.addEventListener("DOMContentLoaded", function () {
     // Price slider setup
@@ -64,8 +69,8 @@ document.addEventListener("DOMContentLoaded", function () {
         minPriceInput.value = Math.round(priceSlider.noUiSlider.get()[0].replace('$', ''));
         maxPriceInput.value = Math.round(priceSlider.noUiSlider.get()[1].replace('$', ''));
         priceRangeLabel.textContent = priceSlider.noUiSlider.get().join(' - ');
-        // AJAX update as you slide
-        fetchGames();
+        // AJAX update as you slide (debounced, see scheduleFetch)
+        scheduleFetch();
     });
 
     // When the size slider is moved, update hidden fields and label and fetch results
@@ -76,42 +81,183 @@ document.addEventListener("DOMContentLoaded", function () {
         minSizeInput.value = parseFloat(val0.replace(' GB', ''));
         maxSizeInput.value = parseFloat(val1.replace(' GB', ''));
         sizeRangeLabel.textContent = sizeSlider.noUiSlider.get().join(' - ');
-        fetchGames();
+        scheduleFetch();
     });
 
     // Set initial labels in case not updated yet
     priceRangeLabel.textContent = "$" + window.minPriceStart + " - $" + window.maxPriceStart;
     sizeRangeLabel.textContent = window.minSizeStart + " GB - " + window.maxSizeStart + " GB";
 
-    function fetchGames() {
+    // Sliders fire 'update' many times per second while dragging, so wait for a short pause
+    // before asking the server, and cancel any request that a newer one has replaced
+    var fetchTimer = null;
+    var inFlight = null;
+    // The sliders also fire 'update' while being set up; the server already rendered those results
+    var ready = false;
+    // Filter arguments of the results currently shown (the next pages use the same ones)
+    var currentParams = null;
+
+    function scheduleFetch() {
+        if (!ready) return;
+        clearTimeout(fetchTimer);
+        fetchTimer = setTimeout(fetchGames, 150);
+    }
+
+    function filterParams() {
         const formData = new FormData(filterForm);
         const params = new URLSearchParams();
         for (const [key, value] of formData.entries()) {
+            // Checked genres are already in the form data (unchecked checkboxes are not)
             if (value !== '' && value != null) params.append(key, value);
         }
-        // Add all checked genres explicitly (because unchecked checkboxes are not included)
-        filterForm.querySelectorAll('input[name="genres"]:checked').forEach(cb => {
-            params.append('genres', cb.value);
+        return params;
+    }
+
+    function fetchGames() {
+        currentParams = filterParams();
+        // Abort the previous request so an old, slower response can't overwrite a newer one
+        if (inFlight) inFlight.abort();
+        const controller = new AbortController();
+        inFlight = controller;
+        // Ask the JSON API for the first page (and the facet counts) and build the cards here
+        // (the browser revalidates with the ETag)
+        const params = new URLSearchParams(currentParams);
+        params.set('facets', '1');
+        fetch(urls.apiGames + "?" + params.toString(), { signal: controller.signal })
+            .then(response => response.json())
+            .then(page => {
+                if (inFlight !== controller) return;
+                inFlight = null;
+                renderFacets(page.facets);
+                gamesList.innerHTML = '<div class="row row-cols-1 row-cols-sm-2 row-cols-md-3 g-5" data-page-items>'
+                    + page.games.map(cardHtml).join('') + '</div>' + nextPageHtml(page.next_cursor);
+                watchNextPage();
+            })
+            .catch(err => {
+                if (err.name !== 'AbortError') console.error(err);
+            });
+    }
+
+    // Counts next to each genre checkbox, the total, and the bars above each slider
+    function renderFacets(facets) {
+        if (!facets) return;
+        document.getElementById('facet-total').textContent = facets.total;
+        document.querySelectorAll('[data-facet-genre]').forEach(function (badge) {
+            badge.textContent = facets.genres[badge.dataset.facetGenre] || 0;
+        });
+        renderHistogram(document.getElementById('price-histogram'), facets.price);
+        renderHistogram(document.getElementById('size-histogram'), facets.size);
+    }
+
+    function renderHistogram(histogram, counts) {
+        const top = Math.max(1, ...counts);
+        histogram.querySelectorAll('span').forEach(function (bar, i) {
+            bar.style.height = (100 * (counts[i] || 0) / top) + '%';
+            bar.title = counts[i] || 0;
+        });
+    }
+
+    // Infinite scroll for the pages built here ("Load more" links of server-rendered pages are left to pager.js)
+    var observer = ('IntersectionObserver' in window) ? new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                loadNextPage(entry.target);
+            }
+        });
+    }, { rootMargin: "400px" }) : null;
+
+    function watchNextPage() {
+        const sentinel = gamesList.querySelector('[data-api-cursor]');
+        if (!sentinel) return;
+        sentinel.querySelector('a').addEventListener('click', function (e) {
+            e.preventDefault();
+            loadNextPage(sentinel);
         });
-        // Perform AJAX request to update games list
-        fetch("/catalogue?" + params.toString(), {
-            headers: { "X-Requested-With": "XMLHttpRequest" }
-        })
-            .then(response => response.text())
-            .then(html => {
-                gamesList.innerHTML = html;
+        if (observer) observer.observe(sentinel);
+    }
+
+    function loadNextPage(sentinel) {
+        if (sentinel.dataset.loading) return;
+        sentinel.dataset.loading = "true";
+        const params = new URLSearchParams(currentParams);
+        params.set('cursor', sentinel.dataset.apiCursor);
+        fetch(urls.apiGames + "?" + params.toString())
+            .then(response => response.json())
+            .then(page => {
+                // The list may have been replaced (filters changed) while we were loading
+                if (!sentinel.isConnected) return;
+                gamesList.querySelector('[data-page-items]')
+                    .insertAdjacentHTML('beforeend', page.games.map(cardHtml).join(''));
+                sentinel.outerHTML = nextPageHtml(page.next_cursor);
+                watchNextPage();
+            })
+            .catch(function () {
+                // Leave the link in place so the user can try again
+                delete sentinel.dataset.loading;
             });
     }
 
+    function nextPageHtml(cursor) {
+        if (!cursor) return '';
+        const params = new URLSearchParams(currentParams);
+        params.set('cursor', cursor);
+        return '<div class="text-center my-4" data-api-cursor="' + escapeHtml(cursor) + '">'
+            + '<a href="' + escapeHtml(urls.catalogue + '?' + params.toString()) + '" class="btn btn-outline-secondary">Load more</a>'
+            + '</div>';
+    }
+
+    // Same markup as templates/game_card.html
+    function cardHtml(game) {
+        const title = escapeHtml(game.title);
+        return '<div class="col"><div class="card h-100 shadow-sm">'
+            + coverHtml(game.cover, title + ' Cover')
+            + '<div class="card-body d-flex flex-column">'
+            + '<h5 class="card-title"><b>' + title + '</b></h5>'
+            + '<p class="card-text flex-grow-1">' + escapeHtml(game.genre) + '</p>'
+            + '<div class="mb-3"><span class="badge bg-success fs-6">' + escapeHtml(game.price) + '</span></div>'
+            + '<div class="mb-2 d-flex">'
+            + '<form action="' + withId(urls.addToCart, game.id) + '" method="post" class="me-2 flex-grow-1">'
+            + '<button type="submit" class="btn btn-primary w-100">Buy</button></form>'
+            + '<a href="' + withId(urls.details, game.id) + '" class="btn btn-info w-100">Details</a>'
+            + '</div></div></div></div>';
+    }
+
+    // Same markup as images.responsive_image()
+    function coverHtml(cover, alt) {
+        if (!cover.webp) {
+            return '<img src="' + escapeHtml(cover.src) + '" class="card-img-top" alt="' + alt + '" loading="lazy">';
+        }
+        return '<picture>'
+            + '<source type="image/webp" srcset="' + escapeHtml(cover.webp) + '" sizes="' + COVER_SIZES + '">'
+            + '<img src="' + escapeHtml(cover.src) + '" srcset="' + escapeHtml(cover.jpeg) + '" sizes="' + COVER_SIZES + '" '
+            + 'width="' + cover.width + '" height="' + cover.height + '" '
+            + 'class="card-img-top" alt="' + alt + '" loading="lazy" decoding="async">'
+            + '</picture>';
+    }
+
+    // The URLs are rendered by the server for game id 0
+    function withId(url, id) {
+        return url.replace('/0', '/' + id);
+    }
+
+    function escapeHtml(value) {
+        return String(value == null ? '' : value)
+            .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+    }
+
     // Listen for filter changes (except slider updates, which we handle separately above)
     filterForm.addEventListener('input', function (e) {
         // Only trigger for checkboxes and search box, not the sliders
         if (!e.target.closest('#price-slider') && !e.target.closest('#size-slider')) {
-            fetchGames();
+            scheduleFetch();
         }
     });
     // When checkboxes change (for example when clicking on a label), fetch results
-    filterForm.addEventListener('change', fetchGames);
+    filterForm.addEventListener('change', scheduleFetch);
     // Prevent full form submit
     filterForm.addEventListener('submit', function (e) { e.preventDefault(); });
+
+    ready = true;
 });
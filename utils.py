@@ -0,0 +1,109 @@
+# Small helpers shared by the routes and the catalogue index
+import json
+import math
+import os
+import threading
+import time
+
+
+def _price_value(price_str):
+    """parse_price() without the fallback: raises ValueError when the string isn't a price."""
+    if not price_str or "free" in price_str.lower():
+        return 0.0
+    # Remove $ and commas, then convert
+    return float(price_str.replace("$", "").replace(",", "").strip())
+
+def _size_value(size_str):
+    """parse_size() without the fallback: raises ValueError when the string isn't a size."""
+    if not size_str:
+        return 0.0
+    size_str = size_str.strip().lower()
+    if size_str.endswith("gb"):
+        return float(size_str[:-2].strip())
+    if size_str.endswith("mb"):
+        return float(size_str[:-2].strip()) / 1024
+    return float(size_str)
+
+def parse_price(price_str):
+    """Convert a price string like '$19.99' or 'Free' to a float value."""
+    try:
+        return _price_value(price_str)
+    except Exception:
+        return 0.0
+
+def parse_size(size_str):
+    """Convert a size string like '2 GB' or '900 MB' to a float in GB."""
+    try:
+        return _size_value(size_str)
+    except Exception:
+        return 0.0
+
+def check_price(price_str):
+    """Like price_to_cents(), but raise ValueError for anything parse_price would have read as 0."""
+    try:
+        value = _price_value(price_str)
+    except ValueError:
+        value = math.nan
+    if not math.isfinite(value) or value < 0:
+        raise ValueError(f"invalid price {price_str!r}")
+    return int(round(value * 100))
+
+def check_size(size_str):
+    """
+    Like size_to_mb(), but raise ValueError for a negative or non-finite number.
+    Text that isn't a size at all (e.g. 'N/A') is 0, as parse_size reads it.
+    """
+    try:
+        value = _size_value(size_str)
+    except ValueError:
+        return 0
+    if not math.isfinite(value) or value < 0:
+        raise ValueError(f"invalid size {size_str!r}")
+    return int(round(value * 1024))
+
+def split_genres(genre_str):
+    """Split a comma-joined genre string like 'Action, RPG' into a list of names."""
+    if not genre_str:
+        return []
+    return [g.strip() for g in genre_str.split(",") if g.strip()]
+
+def price_to_cents(price_str):
+    """Convert a price string to whole cents using the same rules as parse_price."""
+    return int(round(parse_price(price_str) * 100))
+
+def size_to_mb(size_str):
+    """Convert a size string to whole megabytes using the same rules as parse_size."""
+    return int(round(parse_size(size_str) * 1024))
+
+
+class JsonManifest:
+    """A JSON file written by a build command, reloaded when the file changes (checked every few seconds)."""
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._mtime = None
+        self._checked = 0.0
+
+    def entries(self):
+        """The whole manifest ({} if it hasn't been built)."""
+        now = time.monotonic()
+        if now - self._checked > self.check_interval:
+            with self._lock:
+                self._checked = now
+                try:
+                    mtime = os.path.getmtime(self.path)
+                except OSError:
+                    mtime = None
+                if mtime != self._mtime:
+                    self._mtime = mtime
+                    self._entries = {}
+                    if mtime is not None:
+                        with open(self.path) as f:
+                            self._entries = json.load(f)
+        return self._entries
+
+    def get(self, key, default=None):
+        return self.entries().get(key, default)
@@ -0,0 +1,58 @@
+# Start-up work done when a worker boots instead of in its first requests (compiled templates, catalogue data)
+import time
+
+import click
+from sqlalchemy.orm import configure_mappers
+
+from catalogue_index import catalogue_index
+from facets import facet_index
+from models import db
+
+
+def compile_templates(app):
+    """Compile every template (the bytecode cache keeps the result for the next process). Returns the count."""
+    names = [name for name in app.jinja_env.list_templates() if name.endswith(".html")]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+def prime_database():
+    """Set up the ORM mappers and open the first pooled connection."""
+    configure_mappers()
+    db.session.execute(db.select(1))
+
+def prime_catalogue():
+    """Load the catalogue filter bar data and the facet bitsets."""
+    facet_index.snapshot(catalogue_index.ensure_loaded())
+
+def warm_up(app):
+    """
+    Do what a new worker's first requests would otherwise pay for.
+    - Each step is timed; a step that fails is logged and skipped (the request that needs it will retry).
+    Returns {step name: seconds}.
+    """
+    timings = {}
+    with app.app_context():
+        for name, step in (
+            ("templates", lambda: compile_templates(app)),
+            ("database", prime_database),
+            ("catalogue", prime_catalogue),
+        ):
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                app.logger.exception("Warm-up step %r failed", name)
+                db.session.rollback()
+            timings[name] = time.perf_counter() - started
+        db.session.remove()
+    return timings
+
+def init_app(app):
+    """Register the 'flask warm-up' command."""
+
+    @app.cli.command("warm-up")
+    def warm_up_command():
+        """Compile the templates into the cache (e.g. while building an image) and check the catalogue loads."""
+        for name, seconds in warm_up(app).items():
+            click.echo(f"  {name}: {seconds * 1000:.0f} ms")
@@ -0,0 +1,17 @@
+"""
+Production entry point for WSGI servers.
+
+Run the schema upgrade once, then start several worker processes, e.g. with Gunicorn
+(settings in gunicorn.conf.py):
+
+    flask --app wsgi upgrade-db
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every worker builds its own app, connection pool and in-process caches. They share the
+SQLite file in WAL mode (see ProductionConfig), and caches.CacheSync tells each worker
+when another one changed data it has cached.
+"""
+from app import create_app
+from config import ProductionConfig
+
+app = create_app(ProductionConfig)